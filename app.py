@@ -1,17 +1,24 @@
 import streamlit as st
 import pandas as pd
+import plotly.io as pio
 import sys
 import os
 
-print("DEBUG: app.py carregado")
-
 # Adiciona o diretório modules ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
-from modules.data_processor import DataProcessor
+from modules.data_processor import DataProcessor, RELEVANT_COLUMNS, EXPORT_FORMATS
+from modules.cache import normalize_filters
+from modules.ingest_worker import IngestionWorker, ACTIVE_STATUSES
+from modules.api import start_api_server
 from modules.visualizations import DashboardVisualizations
+from modules.backlog import AGING_DIMENSION
+from modules import instrumentation
 from config.settings import *
 
+# Etapas deste rerun (consultas, KPIs, gráficos) exibidas no painel "Desempenho"
+run = instrumentation.start_run("rerun")
+
 # Configuração da página
 st.set_page_config(
     page_title=PAGE_TITLE,
@@ -20,15 +27,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inicialização das classes
-# @st.cache_resource # Removendo o cache para forçar a recarga das classes
+# Inicialização das classes (compartilhadas entre sessões, junto com o cache de resultados)
+@st.cache_resource
 def init_components():
-    print("DEBUG: init_components chamado")
-    processor = DataProcessor()
+    processor = DataProcessor(DATABASE_PATH)
     visualizer = DashboardVisualizations()
-    return processor, visualizer
+    worker = IngestionWorker(processor)
+    # API somente leitura para painéis e relatórios (ver modules/api.py), com o mesmo cache do dashboard
+    start_api_server(processor, API_HOST, API_PORT)
+    return processor, visualizer, worker
 
-processor, visualizer = init_components()
+processor, visualizer, worker = init_components()
 
 # Título principal
 st.title("🎯 ITSM Dashboard - Análise de Chamados")
@@ -37,111 +46,154 @@ st.markdown("---")
 # Sidebar para upload e filtros
 st.sidebar.header("📁 Upload de Dados")
 
-# Upload de arquivo
-uploaded_file = st.sidebar.file_uploader(
-    "Escolha um arquivo CSV",
-    type=['csv'],
-    help="Faça upload do arquivo CSV exportado do ITSM"
+# Upload de arquivos (vários arquivos podem ser enfileirados de uma vez)
+uploaded_files = st.sidebar.file_uploader(
+    "Escolha arquivos CSV ou XLSX",
+    type=['csv', 'xlsx'],
+    accept_multiple_files=True,
+    help="Faça upload dos arquivos CSV/XLSX exportados do ITSM"
 )
 
-# Processamento do arquivo
-if uploaded_file is not None:
+# O widget mantém os arquivos entre reruns; só envia ao worker os uploads novos
+submitted_files = st.session_state.setdefault("submitted_file_ids", set())
+for uploaded_file in uploaded_files or []:
+    if uploaded_file.file_id in submitted_files:
+        continue
     try:
-        with st.spinner("Processando arquivo..."):
-            print(f"DEBUG: Arquivo uploaded: {uploaded_file.name}")
-            # Salva arquivo temporariamente
-            temp_path = f"data/raw/temp_{uploaded_file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # Processa o arquivo
-            df = processor.process_csv_file(temp_path)
-            
-            # Salva na base de dados
-            processor.save_to_database(df)
-            
-            st.sidebar.success(f"✅ Arquivo processado com sucesso!")
-            st.sidebar.info(f"📊 {len(df)} registros carregados")
-            
-            # Remove arquivo temporário
-            os.remove(temp_path)
-            
+        # Lê direto do buffer em memória do upload; a ingestão roda em segundo plano
+        job_id, ingestion = worker.submit(uploaded_file.name, uploaded_file.getbuffer())
+        if ingestion is not None:
+            st.sidebar.info(
+                f"ℹ️ {uploaded_file.name} já processado em {ingestion['ingested_at']} "
+                f"({ingestion['row_count']} registros)"
+            )
+        submitted_files.add(uploaded_file.file_id)
     except Exception as e:
-        st.sidebar.error(f"❌ Erro ao processar arquivo: {str(e)}")
+        st.sidebar.error(f"❌ Erro ao enviar {uploaded_file.name}: {str(e)}")
+
+JOB_STATUS_LABELS = {
+    "queued": "⏳ Na fila",
+    "parsing": "📖 Lendo arquivo",
+    "writing": "💾 Gravando",
+    "done": "✅ Concluído",
+    "failed": "❌ Falhou"
+}
+
+def render_ingest_jobs():
+    jobs = worker.jobs(INGEST_JOBS_SHOWN)
+    if not jobs:
+        return
+    st.caption("Ingestões recentes")
+    for job in jobs:
+        label = f"{JOB_STATUS_LABELS.get(job['status'], job['status'])} · {job['file_name']}"
+        if job["status"] in ACTIVE_STATUSES:
+            st.progress(min(float(job["progress"] or 0), 1.0), text=f"{label} ({int(job['rows_read'] or 0):,} linhas)")
+        elif job["status"] == "done":
+            # Partições substituídas: chamados do mês que não vieram no export foram removidos
+            replaced = ""
+            if job.get("partitions"):
+                replaced = f", {int(job['removed'] or 0)} removidos (mês {job['partitions'].replace(',', ', ')} substituído)"
+            st.markdown(
+                f"{label}  \n{int(job['rows_read']):,} registros: {int(job['inserted'])} novos, "
+                f"{int(job['updated'])} atualizados, {int(job['unchanged'])} sem alteração{replaced} "
+                f"({job['parse_seconds'] + job['write_seconds']:.1f}s)"
+            )
+        else:
+            st.markdown(f"{label}  \n{job['error']}")
+
+    # Quando a ingestão conclui, a versão da base muda: recarrega a página inteira
+    if st.session_state.get("polling_ingest") and not any(job["status"] in ACTIVE_STATUSES for job in jobs):
+        st.session_state["polling_ingest"] = False
+        st.rerun()
+
+with st.sidebar:
+    # Consulta o status periodicamente só enquanto houver jobs em andamento
+    if worker.has_active_jobs():
+        st.session_state["polling_ingest"] = True
+        st.fragment(run_every=INGEST_POLL_SECONDS)(render_ingest_jobs)()
+    else:
+        st.session_state["polling_ingest"] = False
+        render_ingest_jobs()
+
+# Filtros na sidebar
+st.sidebar.header("🔍 Filtros")
 
-# Carrega dados da base de dados
+# Os resultados abaixo ficam no cache compartilhado, chaveados pela versão da base e pelos filtros
+dataset_version = processor.get_dataset_version()
+
+def cached(namespace, filters, compute):
+    return processor.cached(namespace, filters, compute, version=dataset_version)
+
+def cached_chart(name, builder, data, filters):
+    # Gráficos guardados serializados (JSON) no cache; None quando não há dados suficientes
+    def build():
+        fig = builder(data)
+        return fig.to_json() if fig else None
+    fig_json = cached(f"chart:{name}", filters, build)
+    return pio.from_json(fig_json) if fig_json else None
+
+# Os filtros são aplicados na própria consulta SQL; só as linhas selecionadas são carregadas
 try:
-    print("DEBUG: Carregando dados da base de dados")
-    df = processor.load_from_database()
-    
-    if df.empty:
-        st.warning("⚠️ Nenhum dado encontrado. Faça upload de um arquivo CSV para começar.")
-        st.stop()
-    
+    date_bounds = cached("date_range", {}, processor.get_date_range)
 except Exception as e:
     st.error(f"❌ Erro ao carregar dados: {str(e)}")
     st.stop()
 
-# Filtros na sidebar
-st.sidebar.header("🔍 Filtros")
+if date_bounds is None:
+    st.warning("⚠️ Nenhum dado encontrado. Faça upload de um arquivo CSV para começar.")
+    st.stop()
+
+filters = {"start_date": None, "end_date": None, "category": None, "analyst": None, "status": None, "search": None}
 
 # Filtro por período - AGORA USA 'Data fechamento'
-if 'Data fechamento' in df.columns:
-    print("DEBUG: Aplicando filtro de data")
-    df['Data fechamento'] = pd.to_datetime(df['Data fechamento'], errors='coerce')
-    dates = df['Data fechamento'].dropna()
-    
-    if not dates.empty:
-        min_date = dates.min().date()
-        max_date = dates.max().date()
-        
-        date_range = st.sidebar.date_input(
-            "Período (Data de Fechamento)",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=max_date
-        )
-        
-        if len(date_range) == 2:
-            start_date, end_date = date_range
-            # Ajusta end_date para incluir o dia inteiro
-            end_date_inclusive = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-            
-            df = df[
-                (df['Data fechamento'] >= pd.to_datetime(start_date)) & 
-                (df['Data fechamento'] <= end_date_inclusive)
-            ]
+min_date, max_date = date_bounds
+date_range = st.sidebar.date_input(
+    "Período (Data de Fechamento)",
+    value=(min_date, max_date),
+    min_value=min_date,
+    max_value=max_date
+)
+
+if len(date_range) == 2:
+    filters["start_date"], filters["end_date"] = date_range
 
 # Filtro por categoria
-if 'Categoria' in df.columns:
-    print("DEBUG: Aplicando filtro de categoria")
-    categories = ['Todas'] + sorted(df['Categoria'].dropna().unique().tolist())
-    selected_category = st.sidebar.selectbox("Categoria", categories)
-    
-    if selected_category != 'Todas':
-        df = df[df['Categoria'] == selected_category]
+categories = ['Todas'] + cached("options:Categoria", filters, lambda: processor.get_distinct_values('Categoria', **filters))
+selected_category = st.sidebar.selectbox("Categoria", categories)
+if selected_category != 'Todas':
+    filters["category"] = selected_category
 
 # Filtro por analista
-if 'Analista Responsável' in df.columns:
-    print("DEBUG: Aplicando filtro de analista")
-    analysts = ['Todos'] + sorted(df['Analista Responsável'].dropna().unique().tolist())
-    selected_analyst = st.sidebar.selectbox("Analista", analysts)
-    
-    if selected_analyst != 'Todos':
-        df = df[df['Analista Responsável'] == selected_analyst]
+analysts = ['Todos'] + cached("options:Analista Responsável", filters, lambda: processor.get_distinct_values('Analista Responsável', **filters))
+selected_analyst = st.sidebar.selectbox("Analista", analysts)
+if selected_analyst != 'Todos':
+    filters["analyst"] = selected_analyst
 
 # Filtro por status
-if 'Flag Em Aberto' in df.columns:
-    print("DEBUG: Aplicando filtro de status")
-    status_options = ['Todos'] + sorted(df['Flag Em Aberto'].dropna().unique().tolist())
-    selected_status = st.sidebar.selectbox("Status", status_options)
-    
-    if selected_status != 'Todos':
-        df = df[df['Flag Em Aberto'] == selected_status]
+status_options = ['Todos'] + cached("options:Flag Em Aberto", filters, lambda: processor.get_distinct_values('Flag Em Aberto', **filters))
+selected_status = st.sidebar.selectbox("Status", status_options)
+if selected_status != 'Todos':
+    filters["status"] = selected_status
+
+# Busca textual no título e no comentário da pesquisa de satisfação (índice FTS5), combinada com os filtros acima
+search_text = st.sidebar.text_input(
+    "Buscar", placeholder="ex.: impressora, VPN",
+    help="Todas as palavras precisam aparecer no título ou no comentário (início de palavra, sem diferenciar acentos)"
+)
+if search_text.strip():
+    filters["search"] = search_text.strip()
+
+# Carrega dados filtrados da base de dados
+try:
+    # KPIs e gráficos usam a tabela agregada sempre que os filtros ativos permitem;
+    # os chamados só são carregados quando o agregado não responde ao filtro.
+    # KPIs, estatísticas e séries de todos os gráficos saem de uma única passada.
+    summary_df, aggregation = processor.summarize(filters, dataset_version)
+except Exception as e:
+    st.error(f"❌ Erro ao carregar dados: {str(e)}")
+    st.stop()
 
-# Calcula KPIs
-print("DEBUG: Calculando KPIs")
-kpis = processor.calculate_kpis(df)
+kpis = aggregation.kpis
 
 # Exibe KPIs principais
 st.header("📈 Indicadores Principais")
@@ -149,144 +201,200 @@ visualizer.create_kpi_cards(kpis)
 
 st.markdown("---")
 
-# Layout em colunas para gráficos
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("📊 Distribuição por Categoria")
-    print("DEBUG: Criando gráfico de categoria")
-    category_chart = visualizer.create_category_chart(df)
-    if category_chart:
-        st.plotly_chart(category_chart, use_container_width=True)
-    else:
-        st.info("Dados insuficientes para este gráfico")
-
-with col2:
-    st.subheader("⏰ Chamados por Período")
-    print("DEBUG: Criando gráfico de timeline")
-    timeline_chart = visualizer.create_timeline_chart(df)
-    if timeline_chart:
-        st.plotly_chart(timeline_chart, use_container_width=True)
+# Gráficos agrupados em abas; cada linha do grupo vira um conjunto de colunas:
+# (chave no cache, título, construtor, mensagem sem dados, exibe o tamanho do payload)
+NO_CHART_DATA = "Dados insuficientes para este gráfico"
+CHART_GROUPS = {
+    "📊 Visão Geral": [[
+        ("category_chart", "📊 Distribuição por Categoria", visualizer.create_category_chart, NO_CHART_DATA, False),
+        ("timeline_chart", "⏰ Chamados por Período", visualizer.create_timeline_chart, NO_CHART_DATA, True)
+    ]],
+    "👥 Analistas": [
+        [("analyst_performance_chart", "👥 Produtividade - Encerrados por Analista",
+          visualizer.create_analyst_performance_chart, NO_CHART_DATA, False)],
+        [("analyst_daily_productivity", "📈 Produtividade Diária por Analista",
+          visualizer.create_analyst_daily_productivity, NO_CHART_DATA, True)]
+    ],
+    "🎯 SLA e Prioridade": [[
+        ("sla_chart", "🎯 Cumprimento de SLA", visualizer.create_sla_chart, NO_CHART_DATA, False),
+        ("priority_chart", "⚡ Chamados por Prioridade", visualizer.create_priority_chart, NO_CHART_DATA, False)
+    ]],
+    "😊 Satisfação e Resolução": [[
+        ("satisfaction_chart", "😊 Grau de Satisfação", visualizer.create_satisfaction_chart,
+         "Dados de satisfação não disponíveis", False),
+        ("resolution_time_chart", "⏱️ Distribuição do Tempo de Resolução", visualizer.create_resolution_time_chart,
+         NO_CHART_DATA, False)
+    ]]
+}
+
+# Backlog: série própria (não vem da agregação), com a quebra escolhida dentro da aba
+BACKLOG_GROUP = "📉 Backlog"
+BACKLOG_BREAKDOWNS = {
+    "Total": None,
+    "Categoria": "Categoria",
+    "Prioridade": "Prioridade",
+    "Analista": "Analista Responsável",
+    "Idade": AGING_DIMENSION
+}
+
+def render_backlog(filters):
+    st.subheader("📉 Evolução do Backlog")
+    breakdown = st.radio("Quebrar por", list(BACKLOG_BREAKDOWNS), horizontal=True)
+    # Calculado uma vez por versão da base e filtros de categoria/analista/busca; o período só recorta a série
+    scope = {"category": filters.get("category"), "analyst": filters.get("analyst"), "search": filters.get("search")}
+    backlog = cached("backlog", scope, lambda: processor.backlog(**scope))
+    chart = cached_chart(
+        f"backlog_chart:{breakdown}",
+        lambda data: visualizer.create_backlog_chart(data, BACKLOG_BREAKDOWNS[breakdown]),
+        backlog.between(filters.get("start_date"), filters.get("end_date")),
+        filters
+    )
+    if chart:
+        st.plotly_chart(chart, use_container_width=True)
+        st.caption("Chamados em aberto ao fim de cada dia, reconstruídos pelas datas de criação e fechamento "
+                   "(o filtro de status não se aplica)")
     else:
-        st.info("Dados insuficientes para este gráfico")
+        st.info(NO_CHART_DATA)
+
+# Os trechos abaixo são fragmentos: uma interação com os widgets de um fragmento reexecuta só ele,
+# com os argumentos do último rerun completo (os filtros da sidebar continuam disparando o rerun completo)
+@st.fragment
+def render_charts(aggregation, filters):
+    with instrumentation.run_scope("fragment:charts"):
+        # Abas montadas sob demanda: só os gráficos do grupo selecionado são gerados
+        group = st.radio("Grupo de gráficos", list(CHART_GROUPS) + [BACKLOG_GROUP], horizontal=True,
+                         label_visibility="collapsed")
+        if group == BACKLOG_GROUP:
+            render_backlog(filters)
+            return
+        for row in CHART_GROUPS[group]:
+            for column, (name, title, builder, empty_message, show_payload) in zip(st.columns(len(row)), row):
+                with column:
+                    st.subheader(title)
+                    chart = cached_chart(name, builder, aggregation, filters)
+                    if chart:
+                        st.plotly_chart(chart, use_container_width=True)
+                        if show_payload:
+                            st.caption(f"Payload do gráfico: {visualizer.payload_size(chart) / 1024:.0f} KB")
+                    else:
+                        st.info(empty_message)
+
+render_charts(aggregation, filters)
+
+@st.fragment
+def render_detail_table(filters, total_rows):
+    with instrumentation.run_scope("fragment:detail_table"):
+        all_columns = RELEVANT_COLUMNS
+        default_columns = [
+            'PK Dataset Chamados', 'Analista Responsável', 'Categoria', 
+            'Data criação', 'Data fechamento', 'Status (descrição)' , 'Prioridade', 'Título requisição'
+        ]
+        
+        # Filtra apenas colunas que existem no DataFrame
+        available_default_columns = [col for col in default_columns if col in all_columns]
+        
+        selected_columns = st.multiselect(
+            "Selecione as colunas para exibir:",
+            all_columns,
+            default=available_default_columns[:8]  # Limita a 8 colunas por padrão
+        )
 
-# Segunda linha de gráficos
-col3, col4 = st.columns(2)
+        col_sort, col_order = st.columns([3, 1])
+        with col_sort:
+            sort_by = st.selectbox("Ordenar por", all_columns, index=all_columns.index("Data fechamento"))
+        with col_order:
+            descending = st.checkbox("Decrescente", value=False)
+        
+        if not selected_columns:
+            return
 
-with col3:
-    st.subheader("👥 Produtividade - Encerrados por Analista")
-    print("DEBUG: Criando gráfico de performance do analista")
-    analyst_chart = visualizer.create_analyst_performance_chart(df)
-    if analyst_chart:
-        st.plotly_chart(analyst_chart, use_container_width=True)
-    else:
-        st.info("Dados insuficientes para este gráfico")
-
-with col4:
-    st.subheader("🎯 Cumprimento de SLA")
-    print("DEBUG: Criando gráfico de SLA")
-    sla_chart = visualizer.create_sla_chart(df)
-    if sla_chart:
-        st.plotly_chart(sla_chart, use_container_width=True)
-    else:
-        st.info("Dados insuficientes para este gráfico")
+        # Exibe tabela paginada: busca só a página atual e as colunas selecionadas (paginação por chave)
+        page_size = 50
+        total_pages = (total_rows - 1) // page_size + 1
 
-# Terceira linha de gráficos
-col5, col6 = st.columns(2)
+        signature = (normalize_filters(filters), sort_by, descending, dataset_version)
+        page_state = st.session_state.setdefault("detail_page", {})
+        if page_state.get("signature") != signature:
+            page_state.clear()
+            page_state.update(signature=signature, page=1, anchor=None, direction="next")
 
-with col5:
-    st.subheader("⚡ Chamados por Prioridade")
-    print("DEBUG: Criando gráfico de prioridade")
-    priority_chart = visualizer.create_priority_chart(df)
-    if priority_chart:
-        st.plotly_chart(priority_chart, use_container_width=True)
-    else:
-        st.info("Dados insuficientes para este gráfico")
-
-with col6:
-    st.subheader("😊 Grau de Satisfação")
-    print("DEBUG: Criando gráfico de satisfação")
-    satisfaction_chart = visualizer.create_satisfaction_chart(df)
-    if satisfaction_chart:
-        st.plotly_chart(satisfaction_chart, use_container_width=True)
-    else:
-        st.info("Dados de satisfação não disponíveis")
+        if total_pages > 1:
+            col_first, col_prev, col_next, col_info = st.columns([1, 1, 1, 3])
+            with col_first:
+                if st.button("⏮️ Primeira", disabled=page_state["page"] <= 1):
+                    page_state.update(page=1, anchor=None, direction="next")
+            with col_prev:
+                if st.button("⬅️ Anterior", disabled=page_state["page"] <= 1) and page_state["page"] > 1:
+                    page_state.update(page=page_state["page"] - 1, anchor=page_state["first"], direction="prev")
+            with col_next:
+                # Sem "last" a página acabou de ser reiniciada (filtros ou versão da base mudaram): fica na primeira
+                if (st.button("Próxima ➡️", disabled=page_state["page"] >= total_pages)
+                        and page_state["page"] < total_pages and "last" in page_state):
+                    page_state.update(page=page_state["page"] + 1, anchor=page_state["last"], direction="next")
+            if page_state["page"] == 1:
+                page_state.update(anchor=None, direction="next")
+
+        page_df, page_state["first"], page_state["last"] = processor.fetch_page(
+            selected_columns, sort_by, descending, page_state["anchor"], page_state["direction"], page_size, **filters
+        )
 
-# Nova seção: Produtividade Diária
-st.markdown("---")
-st.subheader("📈 Produtividade Diária por Analista")
-print("DEBUG: Criando gráfico de produtividade diária do analista")
-daily_productivity_chart = visualizer.create_analyst_daily_productivity(df)
-if daily_productivity_chart:
-    st.plotly_chart(daily_productivity_chart, use_container_width=True)
-else:
-    st.info("Dados insuficientes para este gráfico")
-
-# Seção de tempo de resolução
-st.subheader("⏱️ Distribuição do Tempo de Resolução")
-print("DEBUG: Criando gráfico de tempo de resolução")
-resolution_chart = visualizer.create_resolution_time_chart(df)
-if resolution_chart:
-    st.plotly_chart(resolution_chart, use_container_width=True)
-else:
-    st.info("Dados insuficientes para este gráfico")
+        start_idx = (page_state["page"] - 1) * page_size
+        end_idx = min(start_idx + page_size, total_rows)
+        if total_pages > 1:
+            with col_info:
+                st.write(f"Página {page_state['page']} de {total_pages} — registros {start_idx + 1} a {end_idx} de {total_rows}")
+        st.dataframe(page_df, use_container_width=True, hide_index=True)
+
+@st.fragment
+def render_export(filters):
+    with instrumentation.run_scope("fragment:export"):
+        # Exportação sob demanda: o arquivo só é gerado quando solicitado
+        export_signature = (normalize_filters(filters), dataset_version)
+        export_state = st.session_state.get("export")
+        if export_state is not None and export_state["signature"] != export_signature:
+            export_state = st.session_state["export"] = None
+
+        col_format, col_prepare, col_download = st.columns([2, 1, 2])
+        with col_format:
+            export_format = st.selectbox(
+                "Formato de exportação", list(EXPORT_FORMATS), format_func=lambda fmt: EXPORT_FORMATS[fmt][0]
+            )
+        with col_prepare:
+            if st.button("📦 Preparar download"):
+                with st.spinner("Gerando arquivo..."):
+                    # O st.download_button precisa dos bytes; guardamos só o arquivo final (compactado, se escolhido)
+                    with processor.export(export_format, **filters) as export_file:
+                        export_state = st.session_state["export"] = {
+                            "signature": export_signature,
+                            "format": export_format,
+                            "data": export_file.read()
+                        }
+        with col_download:
+            if export_state is not None:
+                label, mime, extension = EXPORT_FORMATS[export_state["format"]]
+                st.download_button(
+                    label=f"📥 Download dos dados filtrados ({label})",
+                    data=export_state["data"],
+                    file_name=f"itsm_dados_filtrados_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}{extension}",
+                    mime=mime
+                )
 
 # Tabela de dados detalhados
 st.markdown("---")
 st.header("📋 Dados Detalhados")
 
-# Seleção de colunas para exibir
-if not df.empty:
-    all_columns = df.columns.tolist()
-    default_columns = [
-        'PK Dataset Chamados', 'Analista Responsável', 'Categoria', 
-        'Data criação', 'Data fechamento', 'Status (descrição)' , 'Prioridade', 'Título requisição'
-    ]
-    
-    # Filtra apenas colunas que existem no DataFrame
-    available_default_columns = [col for col in default_columns if col in all_columns]
-    
-    selected_columns = st.multiselect(
-        "Selecione as colunas para exibir:",
-        all_columns,
-        default=available_default_columns[:8]  # Limita a 8 colunas por padrão
-    )
-    
-    if selected_columns:
-        # Exibe tabela paginada
-        page_size = 50
-        total_rows = len(df)
-        total_pages = (total_rows - 1) // page_size + 1
-        
-        if total_pages > 1:
-            page = st.number_input(
-                f"Página (1 a {total_pages})",
-                min_value=1,
-                max_value=total_pages,
-                value=1
-            )
-            
-            start_idx = (page - 1) * page_size
-            end_idx = min(start_idx + page_size, total_rows)
-            
-            st.write(f"Exibindo registros {start_idx + 1} a {end_idx} de {total_rows}")
-            st.dataframe(df[selected_columns].iloc[start_idx:end_idx], use_container_width=True)
-        else:
-            st.dataframe(df[selected_columns], use_container_width=True)
-    
-    # Botão para download
-    csv = df.to_csv(index=False)
-    st.download_button(
-        label="📥 Download dos dados filtrados (CSV)",
-        data=csv,
-        file_name=f"itsm_dados_filtrados_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv"
-    )
+total_rows = cached("count", filters, lambda: processor.count(**filters))
+if total_rows > 0:
+    render_detail_table(filters, total_rows)
+    render_export(filters)
+
+def run_table(instrumented_run):
+    return pd.DataFrame(instrumented_run.records()).astype({"Linhas entrada": "Int64", "Linhas saída": "Int64"})
 
 # Informações do sistema
 st.markdown("---")
 with st.expander("ℹ️ Informações do Sistema"):
-    stats = processor.get_summary_stats(df)
+    stats = aggregation.stats
     
     col_info1, col_info2, col_info3 = st.columns(3)
     
@@ -304,6 +412,38 @@ with st.expander("ℹ️ Informações do Sistema"):
         if stats.get('periodo_fim'):
             st.metric("Período Fim", stats['periodo_fim'])
 
+    # Memória ocupada pelos dados carregados nesta sessão
+    memory = cached("memory_report", filters, lambda: processor.memory_report(summary_df))
+    cache_stats = processor.cache.stats()
+    col_mem1, col_mem2 = st.columns(2)
+    with col_mem1:
+        st.metric("Memória dos Dados (MB)", f"{memory['total_bytes'] / 1024 ** 2:.2f}")
+    with col_mem2:
+        st.metric("Cache Compartilhado (MB)", f"{cache_stats['bytes'] / 1024 ** 2:.2f}")
+    st.dataframe(memory["colunas"], hide_index=True, use_container_width=True)
+
+    # Partições por mês de fechamento: os filtros de período só leem as que cruzam o recorte
+    partitions = cached("partitions", {}, processor.partitions)
+    st.caption(f"Partições por mês de fechamento: {len(partitions)}")
+    st.dataframe(
+        partitions.rename(columns={
+            "month": "Mês", "row_count": "Chamados", "closed_rows": "Com fechamento",
+            "min_fechamento": "Primeiro fechamento", "max_fechamento": "Último fechamento",
+            "min_criacao": "Primeira criação", "max_criacao": "Última criação", "version": "Versão"
+        }),
+        hide_index=True, use_container_width=True
+    )
+
+    # Tempo, linhas e memória de cada etapa deste rerun até aqui (ver modules/instrumentation.py)
+    st.subheader("⚙️ Desempenho")
+    st.caption(f"Rerun atual: {len(run.spans)} etapas em {run.elapsed() * 1000:.0f} ms")
+    st.dataframe(run_table(run), hide_index=True, use_container_width=True)
+    ingest_run = instrumentation.last_run("ingest")
+    if ingest_run is not None:
+        started_at = pd.Timestamp.fromtimestamp(ingest_run.started_at).strftime("%d/%m/%Y %H:%M:%S")
+        st.caption(f"Última ingestão ({started_at}): {ingest_run.seconds:.1f} s")
+        st.dataframe(run_table(ingest_run), hide_index=True, use_container_width=True)
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -315,5 +455,4 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-
-
+instrumentation.finish_run()
@@ -0,0 +1,246 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Gerador de exports sintéticos no formato do ITSM (mesmo cabeçalho de 58 colunas do
+# ResultsTable, preâmbulo "Refinamentos:" e texto em português), para medir desempenho
+# em escala de produção.
+#
+# Exemplos:
+#   python benchmarks/generate_export.py 100k /tmp/export_100k.csv
+#   python benchmarks/generate_export.py 1M /tmp/export_1M.csv --encoding cp1252 --months 36
+#   python benchmarks/generate_export.py 5k /tmp/export_2025_06.csv --refinement 2025/06
+
+EXPORT_HEADER = [
+    "PK Dataset Chamados", "Analista Responsável", "Apontamentos - Tempo total em horas",
+    "Apontamentos - Tempo total em minutos", "Categoria", "Categoria (Ord.)", "Categoria 1", "Categoria 2",
+    "Categoria 3", "Centro de Custo do solicitante - código", "Centro de Custo do solicitante - descrição",
+    "Centro de Custo do solicitante - qtd. Integrantes", "Data criação", "Data fechamento", "Data/Hora criação",
+    "Data/Hora fechamento", "Faixa de idade do chamado", "Flag Atendeu SLA", "Flag Em Aberto",
+    "Flag Indisponibilidade", "Flag Retrabalho", "Flag solicitante igual atendente", "Grupo Solucionador",
+    "Hora abertura", "Hora fechamento", "Local usuário", "Mês/Ano abertura", "Mês/Ano fechamento",
+    "Núm. Requisição", "Pesquisa de satisfação - comentário", "Pesquisa de satisfação - nota",
+    "Pesquisa de satisfação - pergunta", "Pesquisa de satisfação - resposta", "PK Dataset Chamados",
+    "Prioridade", "Semana abertura", "Semana Ano abertura", "Semana Ano fechamento", "Semana fechamento",
+    "SLA Descrição", "SLA Tempo hora", "SLA Tipo", "Solicitante (Usuário abertura)", "Status (código)",
+    "Status (descrição)", "Sub-tipo da categoria", "Tempo Aguard. Aprov. (Horas)", "Tempo Aguard. Atend. (Horas)",
+    "Tempo Aguard. Fornec. (Horas)", "Tempo Aguard. Usuário (Horas)", "Tempo Em Atend. (Horas)",
+    "Tempo Novo (Horas)", "Tempo para SLA (Horas)", "Tempo Pend. Cham. (Horas)", "Tempo Resolvido (Horas)",
+    "Tempo Total menos Resolvido (Horas)", "Título requisição", "Urgência"
+]
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+ANALYSTS = [
+    "mateush", "luang", "joaoni", "mariap", "guilhermepa", "galdinov", "carlosm", "daianasantos", "rodrigot",
+    "silass", "uendeln", "franklinc", "marceloa", "ivancardoso", "alexandresilva", "gabrieljaraujo",
+    "gabrielsbrito", "davibdomingos", "marcosol", "anacarolina", "brunoc", "fernandal", "joseantonio",
+    "leticiam", "paulor", "renatas", "thiagof", "viniciusb", "none"
+]
+CATEGORIES = [("INCIDENTE", 0.62), ("SERVICO", 0.35), ("MUDANCA", 0.03)]
+AREAS = [("INFRA", 0.7), ("SISTEMAS", 0.3)]
+SUBCATEGORIES = [
+    "DESKTOP", "IMPRESSORA", "E-MAIL", "BANCO DE DADOS ORACLE", "SOFTWARES", "TELEFONIA FIXA",
+    "ACTIVE DIRECTORY (AD)", "MÁQUINAS E PERIFÉRICOS", "SALA TECNICA TI", "REDE", "EBS-Contas a Pagar (AP)",
+    "EBS-Manutenção (EAM)", "Senior - Segurança"
+]
+ISSUE_TYPES = [
+    "Erro ou Defeito", "Solicitação de Serviço", "Instalação / Remoção", "Reset ou Desbloqueio de Senha",
+    "Check List", "Dúvida", "Configuração"
+]
+COST_CENTERS = [
+    ("040801", "TECNOLOGIA DE INFORMACAO", 37), ("020402", "OPERACAO", 177), ("030201", "SUSTENTABILIDADE", 42),
+    ("020403", "MANUTENCAO DE UNIDADES GERADORAS", 192), ("040301", "CONTROLADORIA", 48),
+    ("020501", "SAÚDE E SEGURANÇA DO TRABALHO", 58), ("N/D", "NÃO DEFINIDO", 385)
+]
+GROUPS = ["FIELD", "EBSDBA", "SISTEMAS", "NOC", "INFRA - SERVIDORES", "TELECOM"]
+LOCATIONS = ["LOCAL NAO INFORMADO", "SÃO PAULO", "BRASÍLIA", "FLORIANÓPOLIS", "GOIÂNIA", "CUIABÁ", "MACEIÓ"]
+PRIORITIES = [("Baixa", 0.6), ("Normal", 0.25), ("Alta", 0.12), ("Critica", 0.03)]
+URGENCIES = [("Baixa", 0.7), ("Média", 0.2), ("Alta", 0.1)]
+STATUSES = [("Encerrado pelo sistema", 0.55), ("Resolvido", 0.3), ("Encerrado pelo usuario", 0.15)]
+SLA_TYPES = [("Horas Úteis", 0.6), ("Sem SLA", 0.3), ("Horas Corridas", 0.1)]
+SATISFACTION = [("Ótimo", 0.6), ("Bom", 0.25), ("Regular", 0.08), ("Ruim", 0.04), ("Péssimo", 0.03)]
+SATISFACTION_SCORES = {"Ótimo": 5, "Bom": 4, "Regular": 3, "Ruim": 2, "Péssimo": 1}
+COMMENTS = [
+    "Ótimo atendimento, obrigado!", "Resolução rápida e eficiente.", "Técnico muito atencioso e prestativo.",
+    "Demorou mais do que o esperado.", "Problema voltou a ocorrer após a solução.", "Excelente, parabéns à equipe.",
+    "Não consegui falar com o técnico responsável."
+]
+TITLES = [
+    "Impressora não imprime", "Solicitação de instalação de software", "Erro ao acessar o sistema",
+    "Configuração de e-mail no celular", "Troca de equipamento com defeito", "Reset de senha do usuário",
+    "Lentidão na rede da unidade", "Criação de usuário no AD", "Cartucho da impressora acabou",
+    "Rádio | Retorno da manutenção", "Task: Verificação Sala de Treinamento Operação", "Acesso à pasta compartilhada"
+]
+WEEKDAYS = ["2 - SEG", "3 - TER", "4 - QUA", "5 - QUI", "6 - SEX", "7 - SÁB", "1 - DOM"]
+AGE_BINS = [(15, "1-15 dias"), (30, "16-30 dias"), (45, "31-45 dias"), (np.inf, "Acima de 45 dias")]
+
+
+def zipf_weights(n, exponent=1.1):
+    # Poucos analistas concentram a maior parte dos chamados
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def pick(rng, choices, size):
+    values = [value for value, _ in choices]
+    weights = np.array([weight for _, weight in choices])
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+def hours_text(values):
+    return np.where(np.isnan(values), "", np.char.mod("%.6f", np.nan_to_num(values)))
+
+
+def generate_chunk(rng, first_pk, size, period_start, period_days):
+    pk = np.arange(first_pk, first_pk + size)
+    created = period_start + pd.to_timedelta(rng.uniform(0, period_days * 86400, size).astype("int64"), unit="s")
+    resolution_hours = rng.lognormal(mean=1.8, sigma=1.4, size=size)
+    closed = created + pd.to_timedelta((resolution_hours * 3600).astype("int64"), unit="s")
+    is_open = rng.random(size) < 0.03
+    local_created = created - pd.Timedelta(hours=3)
+    local_closed = closed - pd.Timedelta(hours=3)
+    age_days = (closed - created).days.to_numpy()
+
+    category = pick(rng, CATEGORIES, size)
+    cost_center = rng.choice(len(COST_CENTERS), size=size, p=zipf_weights(len(COST_CENTERS), 0.8))
+    answered = rng.random(size) < 0.12
+    satisfaction = np.where(answered, pick(rng, SATISFACTION, size), "")
+    worked = np.where(rng.random(size) < 0.6, rng.choice([0.03, 0.25, 0.5, 1.0, 1.25, 2.0], size=size), np.nan)
+    waiting = np.where(rng.random(size) < 0.3, rng.exponential(20, size), np.nan)
+    sla_met = rng.random(size) < 0.82
+
+    def iso(values):
+        return values.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    def week_start(values):
+        monday = values.normalize() - pd.to_timedelta(values.dayofweek, unit="D")
+        return iso(monday + pd.Timedelta(hours=3))
+
+    def blank_if_open(values):
+        return np.where(is_open, "", np.asarray(values, dtype=object))
+
+    columns = [
+        pk,
+        np.array(ANALYSTS, dtype=object)[rng.choice(len(ANALYSTS), size=size, p=zipf_weights(len(ANALYSTS)))],
+        hours_text(worked),
+        hours_text(worked * 60),
+        category,
+        np.where(category == "INCIDENTE", "1-", np.where(category == "SERVICO", "2-", "3-")) + category,
+        pick(rng, AREAS, size),
+        np.array(SUBCATEGORIES, dtype=object)[rng.choice(len(SUBCATEGORIES), size=size, p=zipf_weights(len(SUBCATEGORIES)))],
+        np.array(ISSUE_TYPES, dtype=object)[rng.choice(len(ISSUE_TYPES), size=size, p=zipf_weights(len(ISSUE_TYPES)))],
+        np.array([c[0] for c in COST_CENTERS], dtype=object)[cost_center],
+        np.array([c[1] for c in COST_CENTERS], dtype=object)[cost_center],
+        np.array([c[2] for c in COST_CENTERS])[cost_center],
+        iso(created),
+        blank_if_open(iso(closed)),
+        local_created.strftime("%d/%m/%Y %H:%M"),
+        blank_if_open(local_closed.strftime("%d/%m/%Y %H:%M")),
+        pd.cut(age_days, [-np.inf] + [limit for limit, _ in AGE_BINS], labels=[label for _, label in AGE_BINS]).astype(object),
+        np.where(sla_met, "ATENDEU O SLA", "NAO ATENDEU"),
+        np.where(is_open, "ABERTO", "FECHADO"),
+        np.full(size, "NAO SE APLICA", dtype=object),
+        np.full(size, "NAO SE APLICA", dtype=object),
+        np.where(rng.random(size) < 0.05, "SIM", "NÃO"),
+        np.array(GROUPS, dtype=object)[rng.choice(len(GROUPS), size=size, p=zipf_weights(len(GROUPS)))],
+        local_created.strftime("%H"),
+        blank_if_open(local_closed.strftime("%H")),
+        np.array(LOCATIONS, dtype=object)[rng.choice(len(LOCATIONS), size=size, p=zipf_weights(len(LOCATIONS), 2.0))],
+        created.strftime("%Y/%m"),
+        blank_if_open(closed.strftime("%Y/%m")),
+        pk,
+        np.where(answered & (rng.random(size) < 0.4), np.array(COMMENTS, dtype=object)[rng.integers(0, len(COMMENTS), size)], ""),
+        pd.Series(satisfaction).map(SATISFACTION_SCORES).astype("Int64").astype(object).fillna("").to_numpy(),
+        np.where(answered, "Como você avalia o atendimento recebido?", ""),
+        satisfaction,
+        pk,
+        pick(rng, PRIORITIES, size),
+        np.array(WEEKDAYS, dtype=object)[created.dayofweek],
+        week_start(created),
+        blank_if_open(week_start(closed)),
+        blank_if_open(np.array(WEEKDAYS, dtype=object)[closed.dayofweek]),
+        pick(rng, SLA_TYPES, size),
+        hours_text(rng.choice([4.0, 8.0, 24.0, 80.0], size=size).astype("float64")),
+        hours_text(np.ones(size)),
+        np.char.add("usuario", rng.zipf(1.6, size).clip(max=5000).astype(str)).astype(object),
+        np.full(size, 8),
+        pick(rng, STATUSES, size),
+        np.where(category == "INCIDENTE", "Formulario Incidente - Padrão", "Formulario Solicitação - Padrão"),
+        hours_text(np.where(rng.random(size) < 0.05, rng.exponential(10, size), np.nan)),
+        hours_text(waiting),
+        hours_text(np.where(rng.random(size) < 0.02, rng.exponential(48, size), np.nan)),
+        hours_text(np.where(rng.random(size) < 0.1, rng.exponential(12, size), np.nan)),
+        hours_text(resolution_hours * 0.6),
+        hours_text(resolution_hours * 0.1),
+        hours_text(np.where(sla_met, resolution_hours, np.nan)),
+        hours_text(np.where(rng.random(size) < 0.05, rng.exponential(8, size), np.nan)),
+        hours_text(np.where(rng.random(size) < 0.3, rng.exponential(30, size), np.nan)),
+        hours_text(np.where(is_open, np.nan, resolution_hours)),
+        np.array(TITLES, dtype=object)[rng.choice(len(TITLES), size=size, p=zipf_weights(len(TITLES), 0.7))],
+        pick(rng, URGENCIES, size)
+    ]
+    df = pd.DataFrame({index: values for index, values in enumerate(columns)})
+    # O export termina cada linha com um delimitador
+    df[len(columns)] = ""
+    return df
+
+
+def generate_export(path, rows, seed=42, months=24, encoding="utf-8-sig", chunk_size=200_000,
+                    period_end="2025-06-30", refinement=None):
+    # refinement ("AAAA/MM"): export refinado por "Mês/Ano fechamento", só com chamados fechados nesse mês
+    # (na ingestão substitui o mês inteiro); sem ele o preâmbulo não declara refinamentos e a carga é um upsert
+    rng = np.random.default_rng(seed)
+    if refinement is None:
+        end = pd.Timestamp(period_end)
+        start = end - pd.DateOffset(months=months)
+    else:
+        start = pd.Timestamp(refinement.replace("/", "-") + "-01")
+        end = start + pd.offsets.MonthBegin(1)
+    period_days = (end - start).days
+    month_column = EXPORT_HEADER.index("Mês/Ano fechamento")
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write("Refinamentos:" + (f",Mês/Ano fechamento:,{refinement}" if refinement else "") + "\n")
+        f.write(",".join(EXPORT_HEADER) + ",\n")
+        written, next_pk = 0, 100_000
+        while written < rows:
+            size = min(chunk_size, rows - written)
+            chunk = generate_chunk(rng, next_pk, size, start, period_days)
+            next_pk += size
+            if refinement is not None:
+                # Chamados em aberto ou fechados já no mês seguinte não fazem parte do export do mês
+                chunk = chunk[chunk[month_column] == refinement]
+            chunk.to_csv(f, header=False, index=False, lineterminator="\n")
+            written += len(chunk)
+    return path
+
+
+def parse_size(value):
+    if value in SIZES:
+        return SIZES[value]
+    return int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um export ITSM sintético para benchmarks")
+    parser.add_argument("size", help=f"Número de linhas ou um dos tamanhos {', '.join(SIZES)}")
+    parser.add_argument("output", help="Arquivo CSV de saída")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--months", type=int, default=24, help="Meses cobertos pelos chamados")
+    parser.add_argument("--encoding", default="utf-8-sig", help="Ex.: utf-8-sig (padrão do export) ou cp1252")
+    parser.add_argument("--refinement", metavar="AAAA/MM",
+                        help="Export refinado por Mês/Ano fechamento: só chamados fechados nesse mês")
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.size)
+    generate_export(args.output, rows, seed=args.seed, months=args.months, encoding=args.encoding,
+                    refinement=args.refinement)
+    print(f"{rows} linhas gravadas em {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.util import patch_config_options
+
+from benchmarks.generate_export import SIZES, generate_export, parse_size
+from config import settings
+from modules import instrumentation
+from modules.data_processor import DataProcessor
+from modules.ingest_worker import IngestionWorker
+
+# Teste de carga do dashboard: N sessões simultâneas do app.py (AppTest do Streamlit, uma thread por
+# sessão, como no servidor) sobre uma base sintética, cada uma com uma sequência de interações realistas
+# (filtros, busca, abas de gráficos, paginação da tabela e uploads).
+# Para cada nível de concorrência reporta a latência dos reruns (p50/p95/p99), a memória residente
+# por sessão e a contenção do escritor SQLite (esperas pelo lock de escrita e erros "database is locked").
+#
+# Limitações do AppTest: o upload não é simulável pelo widget, então os arquivos são enviados a um
+# IngestionWorker do próprio teste sobre a mesma base (o mesmo caminho do worker.submit do app), e
+# os fragmentos com run_every não disparam sozinhos.
+#
+# Exemplos:
+#   python benchmarks/load_test.py --levels 1 2 4 8 16
+#   python benchmarks/load_test.py --size 1M --levels 4 8 --actions 30 --output carga_1M.json
+#   python benchmarks/load_test.py --levels 1 4 16 --compare carga_1M.json
+
+APP_PATH = os.path.join(os.path.dirname(__file__), "..", "app.py")
+DEFAULT_LEVELS = [1, 2, 4, 8]
+UPLOAD_ROWS = 5000  # Linhas de cada arquivo enviado pelas sessões
+RSS_SAMPLE_SECONDS = 0.05
+LOCK_ERROR = "database is locked"
+
+# Peso de cada interação na sequência de uma sessão (a primeira é sempre a abertura da página)
+ACTION_WEIGHTS = {
+    "category": 0.15,
+    "analyst": 0.15,
+    "status": 0.05,
+    "period": 0.1,
+    "search": 0.1,
+    "chart_group": 0.15,
+    "next_page": 0.15,
+    "first_page": 0.05,
+    "clear_filters": 0.05,
+    "upload": 0.05
+}
+SEARCH_TERMS = ["impressora", "senha", "rede", "e-mail", "sistema", "equipamento"]
+
+# As sessões são criadas na thread principal, fora de um rerun: os avisos de contexto só poluem a saída
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: record.levelno >= logging.ERROR
+)
+
+
+def by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    return None
+
+
+def button_by_label(at, label):
+    button = by_label(at.button, label)
+    return None if button is None or button.proto.disabled else button
+
+
+@contextlib.contextmanager
+def concurrent_app_tests():
+    # O AppTest registra um Runtime simulado global (e liga a opção global.appTest) no início de cada
+    # run e desfaz ao final: com sessões simultâneas, o fim de uma derrubaria as outras no meio do rerun.
+    # Enquanto o teste roda, a opção fica ligada e o último Runtime registrado vale até o próximo.
+    last = {"runtime": None}
+    original_instance, original_exists = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        if last["runtime"] is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+
+    def exists(cls):
+        return cls._instance is not None or last["runtime"] is not None
+
+    Runtime.instance, Runtime.exists = classmethod(instance), classmethod(exists)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        Runtime.instance, Runtime.exists = original_instance, original_exists
+
+
+class Uploader:
+    # Gera e envia exports sintéticos distintos (cada seed é um arquivo novo para o ledger de ingestão);
+    # os chamados repetem as chaves da base e o arquivo não declara refinamento por mês, então a gravação
+    # é um upsert como no uso real e não substitui meses da base medida
+    def __init__(self, worker, workdir, rows=UPLOAD_ROWS):
+        self.worker = worker
+        self.workdir = workdir
+        self.rows = rows
+        self._seed = 1000
+        self._lock = threading.Lock()
+
+    def payload(self):
+        with self._lock:
+            self._seed += 1
+            seed = self._seed
+        path = generate_export(os.path.join(self.workdir, f"upload_{seed}.csv"), self.rows, seed=seed)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return os.path.basename(path), data
+
+
+class Session:
+    # Uma sessão do navegador: mantém o AppTest (e o session_state) entre as interações
+    def __init__(self, index, uploader, rng, timeout):
+        self.index = index
+        self.uploader = uploader
+        self.rng = rng
+        self.timeout = timeout
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = []  # (ação, segundos)
+        self.errors = []
+
+    def run(self, actions, think_time, start):
+        start.wait()
+        self.step("open", self.at.run)
+        names = list(ACTION_WEIGHTS)
+        weights = np.array(list(ACTION_WEIGHTS.values()))
+        for _ in range(actions):
+            if think_time:
+                time.sleep(self.rng.exponential(think_time))
+            name = names[self.rng.choice(len(names), p=weights / weights.sum())]
+            self.step(name, None if name == "upload" else getattr(self, f"do_{name}"))
+
+    def step(self, name, interaction):
+        # interaction None: upload, com o arquivo gerado fora do tempo medido
+        payload = self.uploader.payload() if interaction is None else None
+        started = time.perf_counter()
+        try:
+            if payload is not None:
+                # No app o envio acontece dentro do rerun que recebe o arquivo
+                self.uploader.worker.submit(*payload)
+                self.at.run()
+            elif interaction() is None:
+                # Widget ausente nesta tela (ex.: tabela com uma página só): não conta como rerun
+                return
+        except Exception as e:
+            self.errors.append(f"{name}: {type(e).__name__}: {e}")
+            return
+        self.samples.append((name, time.perf_counter() - started))
+        self.errors.extend(f"{name}: {exception.value}" for exception in self.at.exception)
+        self.errors.extend(f"{name}: {error.value}" for error in self.at.error)
+
+    def select_random(self, label):
+        widget = by_label(self.at.selectbox, label)
+        if widget is None or len(widget.options) < 2:
+            return None
+        return widget.select(widget.options[self.rng.integers(len(widget.options))]).run()
+
+    def do_category(self):
+        return self.select_random("Categoria")
+
+    def do_analyst(self):
+        return self.select_random("Analista")
+
+    def do_status(self):
+        return self.select_random("Status")
+
+    def do_period(self):
+        widget = by_label(self.at.date_input, "Período (Data de Fechamento)")
+        if widget is None:
+            return None
+        days = (widget.max - widget.min).days
+        if days < 2:
+            return None
+        # Recortes de um a três meses, como quem olha o mês fechado ou o trimestre
+        length = min(int(self.rng.integers(30, 92)), days)
+        first = widget.min + timedelta(days=int(self.rng.integers(0, days - length + 1)))
+        return widget.set_value((first, first + timedelta(days=length))).run()
+
+    def do_search(self):
+        widget = by_label(self.at.text_input, "Buscar")
+        if widget is None:
+            return None
+        term = "" if widget.value else SEARCH_TERMS[self.rng.integers(len(SEARCH_TERMS))]
+        return widget.input(term).run()
+
+    def do_chart_group(self):
+        widget = by_label(self.at.radio, "Grupo de gráficos")
+        if widget is None:
+            return None
+        return widget.set_value(widget.options[self.rng.integers(len(widget.options))]).run()
+
+    def do_next_page(self):
+        button = button_by_label(self.at, "Próxima ➡️")
+        return button.click().run() if button is not None else None
+
+    def do_first_page(self):
+        button = button_by_label(self.at, "⏮️ Primeira")
+        return button.click().run() if button is not None else None
+
+    def do_clear_filters(self):
+        for label in ("Categoria", "Analista", "Status"):
+            widget = by_label(self.at.selectbox, label)
+            if widget is not None:
+                widget.set_value(widget.options[0])
+        search = by_label(self.at.text_input, "Buscar")
+        if search is not None:
+            search.set_value("")
+        return self.at.run()
+
+
+class RssSampler:
+    # Pico da memória residente do processo durante um nível (amostrado numa thread à parte)
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = instrumentation.rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, instrumentation.rss_bytes() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, instrumentation.rss_bytes() or 0)
+
+
+def write_waits():
+    entry = instrumentation.metrics.snapshot().get("ConnectionPool.write_wait", {})
+    return entry.get("count", 0), entry.get("seconds", 0.0)
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def run_level(sessions_count, uploader, args, seed):
+    gc.collect()
+    rss_before = instrumentation.rss_bytes() or 0
+    waits_before, wait_seconds_before = write_waits()
+    rngs = np.random.default_rng(seed).spawn(sessions_count)
+    sessions = [Session(index, uploader, rng, args.timeout) for index, rng in enumerate(rngs)]
+    start = threading.Barrier(sessions_count)
+    threads = [
+        threading.Thread(target=session.run, args=(args.actions, args.think_time, start), name=f"session-{session.index}")
+        for session in sessions
+    ]
+    started = time.perf_counter()
+    with RssSampler() as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    waits_after, wait_seconds_after = write_waits()
+
+    samples = [sample for session in sessions for sample in session.samples]
+    errors = [error for session in sessions for error in session.errors]
+    by_action = {}
+    for name, seconds in samples:
+        by_action.setdefault(name, []).append(seconds)
+    result = {
+        "sessions": sessions_count,
+        "reruns": len(samples),
+        "seconds": elapsed,
+        "reruns_per_second": len(samples) / elapsed if elapsed else None,
+        "latency": percentiles([seconds for _, seconds in samples]),
+        "latency_by_action": {name: {"count": len(values), **percentiles(values)} for name, values in sorted(by_action.items())},
+        "rss_before_mb": rss_before / 1024 ** 2,
+        "rss_peak_mb": sampler.peak / 1024 ** 2,
+        # Sessões são threads do mesmo processo: a memória por sessão é o crescimento do pico dividido entre elas
+        "rss_per_session_mb": max(sampler.peak - rss_before, 0) / sessions_count / 1024 ** 2,
+        "write_waits": waits_after - waits_before,
+        "write_wait_seconds": wait_seconds_after - wait_seconds_before,
+        "lock_errors": sum(LOCK_ERROR in error for error in errors),
+        "errors": len(errors),
+        "error_samples": errors[:5]
+    }
+    # As sessões saem de cena com o nível (o servidor descarta o estado de quem desconecta)
+    del sessions, threads
+    return result
+
+
+def print_level(level):
+    latency = level["latency"]
+    ms = {key: (f"{value * 1000:8.0f}" if value is not None else "       -") for key, value in latency.items()}
+    print(
+        f"  {level['sessions']:>4} sessões  {level['reruns']:>5} reruns  "
+        f"p50 {ms['p50']} ms  p95 {ms['p95']} ms  p99 {ms['p99']} ms  "
+        f"RSS pico {level['rss_peak_mb']:8.1f} MB  por sessão {level['rss_per_session_mb']:6.1f} MB  "
+        f"esperas de escrita {level['write_waits']:>3} ({level['write_wait_seconds']:.2f}s)  "
+        f"locked {level['lock_errors']:>3}  erros {level['errors']:>3}"
+    )
+    for error in level["error_samples"]:
+        print(f"      {error.splitlines()[0][:160]}")
+
+
+def compare(levels, previous):
+    # Variação de p95 e memória por sessão em relação a uma execução anterior, nível a nível
+    reference = {level["sessions"]: level for level in previous.get("levels", [])}
+    for level in levels:
+        before = reference.get(level["sessions"])
+        if before is None or before["latency"]["p95"] is None or level["latency"]["p95"] is None:
+            continue
+        p95_change = level["latency"]["p95"] / before["latency"]["p95"] - 1
+        rss_change = level["rss_per_session_mb"] - before["rss_per_session_mb"]
+        print(
+            f"  {level['sessions']:>4} sessões  p95 {before['latency']['p95'] * 1000:.0f} -> "
+            f"{level['latency']['p95'] * 1000:.0f} ms ({p95_change:+.0%})  "
+            f"RSS por sessão {before['rss_per_session_mb']:.1f} -> {level['rss_per_session_mb']:.1f} MB ({rss_change:+.1f})"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do ITSM Dashboard com sessões simultâneas")
+    parser.add_argument("--size", default="100k", help=f"Tamanho da base sintética: {', '.join(SIZES)} ou número de linhas")
+    parser.add_argument("--levels", nargs="+", type=int, default=DEFAULT_LEVELS, help="Sessões simultâneas por nível")
+    parser.add_argument("--actions", type=int, default=20, help="Interações por sessão (além da abertura da página)")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Pausa média (s) entre interações de uma sessão; 0 mede a capacidade máxima")
+    parser.add_argument("--upload-rows", type=int, default=UPLOAD_ROWS, help="Linhas de cada arquivo enviado")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Limite (s) de cada rerun")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Grava os resultados desta execução em JSON")
+    parser.add_argument("--compare", help="Resultados JSON de uma execução anterior para comparação")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "itsm-bench-data"),
+                        help="Onde os exports sintéticos são gerados (reaproveitados entre execuções)")
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.size)
+    os.makedirs(args.data_dir, exist_ok=True)
+    export_path = os.path.join(args.data_dir, f"export_{args.size}.csv")
+    if not os.path.exists(export_path):
+        print(f"Gerando export sintético com {rows} linhas em {export_path}")
+        generate_export(export_path, rows)
+
+    workdir = tempfile.mkdtemp(prefix="itsm-load-db-")
+    try:
+        db_path = os.path.join(workdir, "itsm_data.db")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            loader = DataProcessor(db_path=db_path)
+            loader.save_to_database(loader.process_csv_file(export_path), mode="replace")
+        # O app lê a configuração a cada rerun: aponta para a base sintética e não sobe a API
+        settings.DATABASE_PATH = db_path
+        settings.API_PORT = None
+        uploader = Uploader(IngestionWorker(loader), workdir, args.upload_rows)
+
+        with concurrent_app_tests():
+            # Primeira abertura fora da medição: inicializa os componentes compartilhados (st.cache_resource)
+            warmup = AppTest.from_file(APP_PATH, default_timeout=args.timeout).run()
+            if warmup.exception:
+                print(f"Erro ao abrir o app: {warmup.exception[0].value}")
+                return 1
+
+            print(f"[{args.size}] {rows} linhas, {args.actions} interações por sessão, pausa média {args.think_time}s")
+            levels = []
+            for index, sessions_count in enumerate(args.levels):
+                level = run_level(sessions_count, uploader, args, args.seed + index)
+                print_level(level)
+                levels.append(level)
+        uploader.worker.executor.shutdown(wait=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "size": args.size,
+        "actions": args.actions,
+        "think_time": args.think_time,
+        "levels": levels
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"Comparação com {args.compare} ({previous.get('created_at')}):")
+        compare(levels, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from benchmarks.generate_export import SIZES, generate_export, parse_size
+from modules.data_processor import DataProcessor, KEY_COLUMN
+from modules.visualizations import DashboardVisualizations
+
+# Benchmarks dos caminhos críticos do dashboard sobre exports sintéticos.
+# Mede tempo de parede (melhor de N execuções) e pico de memória (tracemalloc, execução à parte)
+# e compara com o baseline salvo: acima do limite de regressão o script termina com código 1.
+#
+# Exemplos:
+#   python benchmarks/run_benchmarks.py --sizes 10k 100k
+#   python benchmarks/run_benchmarks.py --sizes 10k 100k --save-baseline
+#   python benchmarks/run_benchmarks.py --sizes 1M --repeat 1 --threshold 0.3
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25  # Regressão: 25% acima do baseline
+NOISE_FLOOR_SECONDS = 0.005  # Diferenças menores que isso são ruído de medição
+NOISE_FLOOR_MB = 1.0
+SEARCH_TERM = "impressora"
+
+# create_kpi_cards usa st.metric: fora do `streamlit run` os avisos de contexto só poluem a saída.
+# Filtro em vez de nível: o Streamlit redefine o nível dos seus loggers ao carregar a configuração.
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: record.levelno >= logging.ERROR
+)
+
+
+def measure(fn, repeat):
+    # Pico de memória numa execução com tracemalloc; tempo como o melhor de `repeat` execuções sem ele
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    return result, {"seconds": min(timings), "peak_mb": peak / 1024 / 1024}
+
+
+def check_pagination(processor, sort_by, descending, page_size=500):
+    # Percorre a tabela detalhada inteira pela paginação por chave: "próxima" até o fim e "anterior"
+    # de volta ao início; cada chamado precisa aparecer exatamente uma vez em cada sentido
+    total = processor.count()
+    forward, anchor, last_first, last_rows = [], None, None, 0
+    while len(forward) <= total:
+        page, first, last = processor.fetch_page([KEY_COLUMN], sort_by, descending, anchor, "next", page_size)
+        if page.empty:
+            break
+        forward.extend(page[KEY_COLUMN])
+        anchor, last_first, last_rows = last, first, len(page)
+    backward, anchor = [], last_first
+    while anchor is not None and len(backward) <= total:
+        page, first, _ = processor.fetch_page([KEY_COLUMN], sort_by, descending, anchor, "prev", page_size)
+        if page.empty:
+            break
+        backward.extend(page[KEY_COLUMN])
+        anchor = first
+    failures = []
+    for direction, keys, expected in (("próxima", forward, total), ("anterior", backward, total - last_rows)):
+        if len(keys) != expected or len(set(keys)) != expected:
+            failures.append(
+                f"paginação por {sort_by} ({'desc' if descending else 'asc'}, {direction}): "
+                f"{len(set(keys))} chamados distintos em {len(keys)} linhas, esperado {expected}"
+            )
+    return failures
+
+
+def run_size(size, path, repeat):
+    workdir = tempfile.mkdtemp(prefix="itsm-bench-db-")
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            processor = DataProcessor(db_path=os.path.join(workdir, "itsm_data.db"))
+            visualizer = DashboardVisualizations()
+        results = {}
+
+        def step(name, fn):
+            value, metrics = measure(fn, repeat)
+            results[name] = metrics
+            print(f"  {name:<40} {metrics['seconds']:>9.4f}s {metrics['peak_mb']:>9.1f} MB")
+            return value
+
+        df = step("process_csv_file", lambda: processor.process_csv_file(path))
+        step("save_to_database", lambda: processor.save_to_database(df, mode="replace"))
+        loaded = step("load_from_database", processor.load_from_database)
+        step("query_rollup", processor.query_rollup)
+        kpis = step("calculate_kpis", lambda: processor.calculate_kpis(loaded))
+        step("get_summary_stats", lambda: processor.get_summary_stats(loaded))
+        aggregation = step("aggregate", lambda: processor.aggregate(loaded))
+        step("create_kpi_cards", lambda: visualizer.create_kpi_cards(kpis))
+        # Busca textual (índice FTS5): termo frequente nos títulos do export sintético
+        step("search_keys", lambda: processor.search_keys(SEARCH_TERM))
+        step("count_search", lambda: processor.count(search=SEARCH_TERM))
+        step("query_search", lambda: processor.query(search=SEARCH_TERM))
+        backlog = step("backlog", processor.backlog)
+        step("create_backlog_chart", lambda: visualizer.create_backlog_chart(backlog, "Analista Responsável"))
+        for name in sorted(dir(visualizer)):
+            if name.startswith("create_") and name not in ("create_kpi_cards", "create_backlog_chart"):
+                method = getattr(visualizer, name)
+                step(name, lambda method=method: method(aggregation))
+        failures = []
+        for sort_by in (KEY_COLUMN, "Tempo de Resolução (horas)", "Data fechamento"):
+            for descending in (False, True):
+                failures.extend(check_pagination(processor, sort_by, descending))
+        print(f"  {'paginação (todas as páginas)':<40} {'ok' if not failures else 'FALHOU'}")
+        return results, failures
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, threshold):
+    # Regressões (tamanho, etapa, métrica, baseline, atual) e etapas sem baseline (tamanho, etapa);
+    # tamanhos que não estão no baseline são ignorados por inteiro (ex.: 1M medido só sob demanda)
+    regressions, missing = [], []
+    for size, steps in results.items():
+        references = baseline.get("results", {}).get(size)
+        if references is None:
+            continue
+        for name, metrics in steps.items():
+            reference = references.get(name)
+            if reference is None:
+                missing.append((size, name))
+                continue
+            for metric, floor in (("seconds", NOISE_FLOOR_SECONDS), ("peak_mb", NOISE_FLOOR_MB)):
+                current, previous = metrics[metric], reference[metric]
+                if current > previous * (1 + threshold) and current - previous > floor:
+                    regressions.append((size, name, metric, previous, current))
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do ITSM Dashboard")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help=f"Tamanhos: {', '.join(SIZES)} ou número de linhas")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções cronometradas por etapa")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Limite de regressão (fração)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--output", help="Grava os resultados desta execução em JSON")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "itsm-bench-data"),
+                        help="Onde os exports sintéticos são gerados (reaproveitados entre execuções)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    failures = []
+    for size in args.sizes:
+        rows = parse_size(size)
+        path = os.path.join(args.data_dir, f"export_{size}.csv")
+        if not os.path.exists(path):
+            print(f"Gerando export sintético com {rows} linhas em {path}")
+            generate_export(path, rows)
+        print(f"[{size}] {rows} linhas")
+        results[size], size_failures = run_size(size, path, args.repeat)
+        failures.extend(f"[{size}] {failure}" for failure in size_failures)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "repeat": args.repeat,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    status = 0
+    for failure in failures:
+        print(f"FALHA {failure}")
+        status = 1
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, missing = compare(results, baseline, args.threshold)
+        for size, name, metric, previous, current in regressions:
+            print(f"REGRESSÃO [{size}] {name} ({metric}): {previous:.4f} -> {current:.4f}")
+        # Etapa nova sem baseline não está protegida: grave o baseline no mesmo commit que a adiciona
+        for size, name in missing:
+            print(f"SEM BASELINE [{size}] {name}: rode com --save-baseline")
+        if regressions or missing:
+            status = 1
+        else:
+            print(f"Sem regressões acima de {args.threshold:.0%} em relação a {args.baseline}")
+
+    if args.save_baseline:
+        # Mantém no baseline os tamanhos que não foram medidos nesta execução
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+            report["results"] = {**previous.get("results", {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import argparse
+import collections
+import glob
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+
+from modules.data_processor import DataProcessor, ExportParser
+from modules import instrumentation
+
+# Carga em lote sem navegador: os arquivos são lidos em paralelo (um processo por arquivo)
+# e gravados na base por um único escritor, do arquivo mais antigo para o mais recente
+# (data de modificação, depois nome): num chamado repetido prevalece o export mais recente.
+# A memória não cresce com o volume da carga: cada leitor grava os blocos já tratados num arquivo
+# temporário, o escritor os consome bloco a bloco e só alguns arquivos ficam em andamento por vez.
+#
+# Exemplos:
+#   python bulk_load.py                      # tudo em data/raw/
+#   python bulk_load.py "exports/2024-*.csv" --workers 8
+#   python bulk_load.py data/raw --replace   # recria a base a partir dos arquivos
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".xlsm")
+DEFAULT_SOURCE = os.path.join(os.path.dirname(__file__), "data", "raw")
+
+_parser = None
+
+
+def _init_parser():
+    # Um leitor por processo; a leitura não abre a base
+    global _parser
+    _parser = ExportParser()
+
+
+def _parse_file(path, spool_dir):
+    # Blocos gravados em sequência num arquivo temporário: o leitor mantém um bloco por vez
+    # e o resultado não trafega inteiro entre os processos
+    started = time.perf_counter()
+    fd, spool = tempfile.mkstemp(suffix=".pkl", dir=spool_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _parser.iter_file_chunks(path):
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.remove(spool)
+        raise
+    return spool, time.perf_counter() - started
+
+
+def _read_spool(spool):
+    with open(spool, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def collect_files(sources):
+    # Aceita diretórios, arquivos e padrões glob
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            matches = glob.glob(source)
+        files.extend(path for path in matches if path.lower().endswith(SUPPORTED_EXTENSIONS))
+    return sorted(set(files), key=lambda path: (os.path.getmtime(path), path))
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return DataProcessor.fingerprint(f.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga em lote de exports ITSM (CSV/XLSX) na base do dashboard")
+    parser.add_argument("sources", nargs="*", default=[DEFAULT_SOURCE], help="Diretórios, arquivos ou padrões glob")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processos de leitura em paralelo")
+    parser.add_argument("--force", action="store_true", help="Reprocessa arquivos já ingeridos")
+    parser.add_argument("--replace", action="store_true", help="Substitui todo o conteúdo da base pelos arquivos")
+    args = parser.parse_args(argv)
+
+    processor = DataProcessor()
+    files = collect_files(args.sources)
+    pending = []
+    for path in files:
+        digest = file_hash(path)
+        ingestion = processor.get_ingestion(digest)
+        if ingestion is not None and not (args.force or args.replace):
+            print(f"Ignorado (já ingerido em {ingestion['ingested_at']}): {path}")
+            continue
+        pending.append((path, digest))
+    if not pending:
+        print("Nenhum arquivo novo para carregar")
+        return 0
+
+    print(f"Carregando {len(pending)} arquivo(s) com {args.workers} processo(s) de leitura")
+    # Gravações instrumentadas como uma execução (exportada se METRICS_EXPORT_PATH estiver configurado)
+    instrumentation.start_run("bulk_load")
+    started = time.perf_counter()
+    total_rows = 0
+    failures = 0
+    # --replace vale para o primeiro arquivo gravado com sucesso; um arquivo com erro antes dele não impede a troca
+    replace_pending = args.replace
+    workers = max(1, args.workers)
+    queue = iter(pending)
+    in_flight = collections.deque()
+    with tempfile.TemporaryDirectory(prefix="itsm-bulk-") as spool_dir, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_parser) as pool:
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                in_flight.append((*item, pool.submit(_parse_file, item[0], spool_dir)))
+
+        # Até dois arquivos por leitor em andamento: os leitores seguem ocupados enquanto o escritor grava
+        for _ in range(2 * workers):
+            submit_next()
+        # Escritor único: grava na ordem dos arquivos enquanto os seguintes ainda estão sendo lidos
+        while in_flight:
+            path, digest, future = in_flight.popleft()
+            submit_next()
+            try:
+                spool, parse_seconds = future.result()
+                write_started = time.perf_counter()
+                mode = "replace" if replace_pending else "upsert"
+                # Como no upload pelo dashboard: export refinado só por mês de fechamento substitui esses meses
+                partitions = processor.declared_partitions(path)
+                try:
+                    result = processor.save_to_database(_read_spool(spool), mode=mode, partitions=partitions)
+                finally:
+                    os.remove(spool)
+                replace_pending = False
+                processor.record_ingestion(digest, os.path.basename(path), os.path.getsize(path), result["rows"])
+            except Exception as e:
+                failures += 1
+                print(f"Erro em {path}: {str(e)}")
+                continue
+            total_rows += result["rows"]
+            replaced = ""
+            if result["partitions"]:
+                replaced = f", {result['removed']} removidos (mês {', '.join(result['partitions'])} substituído)"
+            print(
+                f"{path}: {result['rows']} registros ({result['inserted']} novos, {result['updated']} atualizados, "
+                f"{result['unchanged']} sem alteração{replaced}) — leitura {parse_seconds:.1f}s, "
+                f"gravação {time.perf_counter() - write_started:.1f}s"
+            )
+
+    instrumentation.finish_run()
+    if replace_pending:
+        print("Nenhum arquivo foi gravado: a base não foi substituída")
+    elapsed = time.perf_counter() - started
+    print(f"Concluído: {total_rows} registros em {elapsed:.1f}s ({failures} arquivo(s) com erro)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,4 +37,54 @@ SATISFACTION_COLORS = {
     "Péssimo": "#F44336" # Vermelho
 }
 
+# Ingestão
+INGEST_BATCH_SIZE = 5000  # Linhas por lote de inserção na tabela temporária
+CSV_CHUNK_SIZE = 50000  # Linhas lidas por vez do CSV (limita o pico de memória)
+CSV_SNIFF_BYTES = 64 * 1024  # Prefixo usado para detectar codificação e delimitador
+XLSX_HEADER_SCAN_ROWS = 5  # Linhas iniciais de cada planilha onde o cabeçalho é procurado
+INGEST_POLL_SECONDS = 2  # Intervalo de atualização do status dos jobs na sidebar
+INGEST_JOBS_SHOWN = 5  # Jobs recentes exibidos na sidebar
 
+# Armazenamento: "sqlite" lê o recorte da tabela SQLite; "parquet" lê de snapshots colunares
+# (modules/snapshots.py) gerados a cada ingestão, particionados por mês de fechamento
+STORAGE_BACKEND = "sqlite"
+SNAPSHOT_KEEP_VERSIONS = 2  # Versões de snapshot mantidas em disco
+
+# Conexões SQLite (ver modules/database.py)
+DATABASE_PATH = None  # Base SQLite do dashboard, da API e do bulk_load.py; None usa data/database/itsm_data.db
+SQLITE_JOURNAL_MODE = "WAL"  # Leitores não bloqueiam o escritor (e vice-versa)
+SQLITE_SYNCHRONOUS = "NORMAL"  # Seguro com WAL; fsync só nos checkpoints
+SQLITE_CACHE_SIZE_KB = 64 * 1024  # Cache de páginas por conexão (64 MB)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # Leitura das páginas via memória mapeada (256 MB)
+SQLITE_BUSY_TIMEOUT_MS = 30000  # Espera pelo lock de escrita de outro processo
+SQLITE_READ_POOL_SIZE = 8  # Conexões de leitura mantidas abertas para reuso
+
+# Cache compartilhado entre sessões (dados filtrados, KPIs e gráficos)
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+# Consultas
+QUERY_CHUNK_SIZE = 100000  # Linhas lidas por bloco do SQLite antes da conversão para tipos compactos
+
+# Orçamento de payload dos gráficos de série temporal
+CHART_MAX_POINTS = 5000  # Pontos máximos por gráfico; acima disso agrupa por semana ou mês
+CHART_TOP_ANALYSTS = 10  # Analistas exibidos individualmente; os demais viram "Outros"
+CHART_WEBGL_THRESHOLD = 2000  # Acima desse número de pontos usa traços WebGL (scattergl)
+
+# Backlog de chamados em aberto (ver modules/backlog.py)
+BACKLOG_AGING_DAYS = [7, 30, 90]  # Limites (em dias) das faixas de idade dos chamados em aberto
+
+# Distribuição do tempo de resolução
+SKETCH_RELATIVE_ACCURACY = 0.01  # Erro relativo máximo dos percentis (p50/p90/p99)
+RESOLUTION_HISTOGRAM_BINS = 20
+
+# Exportação dos dados filtrados
+EXPORT_CHUNK_SIZE = 50000  # Linhas lidas por bloco durante a exportação
+EXPORT_SPOOL_BYTES = 16 * 1024 * 1024  # Acima desse tamanho o arquivo exportado vai para o disco
+
+# Instrumentação (ver modules/instrumentation.py)
+METRICS_EXPORT_PATH = None  # Arquivo .prom (formato texto do Prometheus) reescrito ao fim de cada execução; None desativa
+
+# API HTTP somente leitura (ver modules/api.py) para painéis e relatórios que só precisam dos números
+API_HOST = "127.0.0.1"  # Interface de escuta; "0.0.0.0" expõe a API fora da máquina
+API_PORT = 8502  # Porta da API iniciada junto com o dashboard; None desativa
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from modules.sketches import QuantileSketch
+
+# Coluna de contagem das linhas da tabela agregada (ver DataProcessor.query_rollup); única definição,
+# importada pelo data_processor para criar a tabela
+ROLLUP_COUNT = "Quantidade"
+
+# Séries de contagem por dimensão calculadas para os gráficos
+SERIES_COLUMNS = {
+    "categoria": "Categoria",
+    "analista": "Analista Responsável",
+    "sla": "SLA Atendido",
+    "prioridade": "Prioridade",
+    "satisfacao": "Grau de Satisfação",
+    "aberto": "Flag Em Aberto"
+}
+
+# Todas as séries de AggregationResult.series: as de contagem e as diárias
+SERIES_NAMES = list(SERIES_COLUMNS) + ["diario", "analista_diario"]
+
+
+class AggregationResult:
+    # KPIs, estatísticas de resumo e séries dos gráficos de um mesmo recorte de dados;
+    # sketch guarda a distribuição do tempo de resolução (quantis e histograma)
+    def __init__(self, kpis, stats, series, sketch=None):
+        self.kpis = kpis
+        self.stats = stats
+        self.series = series
+        self.sketch = sketch if sketch is not None else QuantileSketch()
+
+    @property
+    def empty(self):
+        return self.kpis["total_chamados"] == 0
+
+
+def _codes(series):
+    # Códigos inteiros por valor (-1 para nulos): usa os códigos do categórico quando disponíveis
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return np.asarray(series.cat.codes), series.cat.categories
+    if pd.api.types.is_bool_dtype(series.dtype):
+        # Flags Sim/Não carregadas como booleano
+        codes = np.where(series.isna(), -1, series.fillna(False).astype("int8"))
+        return codes, pd.Index(["Não", "Sim"])
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, pd.Index(uniques)
+
+
+def _count(codes, labels, weights):
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], weights=weights[valid], minlength=len(labels))
+    result = pd.Series(counts, index=labels)
+    result = result[result > 0].astype("int64")
+    return result.sort_values(ascending=False, kind="stable")
+
+
+def aggregate(df, sketch=None):
+    # Uma passada vetorizada sobre o recorte: bincount dos códigos de cada dimensão,
+    # ponderado pela contagem quando as linhas vêm da tabela agregada.
+    # Linhas agregadas não têm os tempos individuais: o sketch vem pronto da ingestão.
+    if ROLLUP_COUNT in df.columns:
+        weights = df[ROLLUP_COUNT].to_numpy(dtype="float64")
+    else:
+        weights = np.ones(len(df))
+    total = int(weights.sum())
+
+    series = {}
+    for name, column in SERIES_COLUMNS.items():
+        if column in df.columns:
+            codes, labels = _codes(df[column])
+            series[name] = _count(codes, labels, weights)
+            if name == "analista":
+                analyst_codes, analyst_labels = codes, labels
+        else:
+            series[name] = pd.Series(dtype="int64")
+
+    # Dias como deslocamento inteiro a partir do primeiro dia (bins contíguos, sem ordenação)
+    periodo_inicio = periodo_fim = "N/A"
+    series["diario"] = pd.Series(dtype="int64")
+    series["analista_diario"] = pd.DataFrame(columns=["Data", "Analista Responsável", "Chamados Encerrados"])
+    if "Data fechamento" in df.columns:
+        days = df["Data fechamento"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        has_day = ~np.isnat(days)
+        if has_day.any():
+            day_numbers = days.astype("int64")
+            first_day = day_numbers[has_day].min()
+            n_days = int(day_numbers[has_day].max() - first_day) + 1
+            offsets = np.where(has_day, day_numbers - first_day, -1)
+            day_labels = (np.arange(n_days) + first_day).astype("datetime64[D]").astype(object)
+            series["diario"] = _count(offsets, pd.Index(day_labels), weights).sort_index()
+            periodo_inicio = str(day_labels[0])
+            periodo_fim = str(day_labels[-1])
+
+            if "Analista Responsável" in df.columns:
+                n_analysts = len(analyst_labels)
+                combined = np.where((offsets >= 0) & (analyst_codes >= 0), offsets * n_analysts + analyst_codes, -1)
+                valid = combined >= 0
+                counts = np.bincount(combined[valid], weights=weights[valid], minlength=n_days * n_analysts)
+                nonzero = np.flatnonzero(counts)
+                series["analista_diario"] = pd.DataFrame({
+                    "Data": day_labels[nonzero // n_analysts],
+                    "Analista Responsável": np.asarray(analyst_labels)[nonzero % n_analysts],
+                    "Chamados Encerrados": counts[nonzero].astype("int64")
+                }).sort_values(["Data", "Analista Responsável"], ignore_index=True)
+
+    if ROLLUP_COUNT in df.columns:
+        tempo_n = df["Quantidade com Tempo"].sum()
+        tempo_medio = df["Soma Tempo (horas)"].sum() / tempo_n if tempo_n > 0 else float("nan")
+    elif "Tempo de Resolução (horas)" in df.columns:
+        hours = df["Tempo de Resolução (horas)"].to_numpy(dtype="float64", na_value=np.nan)
+        tempo_medio = np.nanmean(hours) if np.isfinite(hours).any() else float("nan")
+        if sketch is None:
+            sketch = QuantileSketch.from_values(hours)
+    else:
+        tempo_medio = 0
+
+    sketch = sketch if sketch is not None else QuantileSketch()
+    quantiles = sketch.quantiles((0.5, 0.9, 0.99))
+    kpis = {
+        "total_chamados": total,
+        "chamados_abertos": int(series["aberto"].get("Sim", 0)),
+        "sla_atendido_percent": (series["sla"].get("Sim", 0) / total * 100) if total > 0 else 0,
+        "tempo_medio_resolucao": tempo_medio,
+        "tempo_p50_resolucao": quantiles[0.5],
+        "tempo_p90_resolucao": quantiles[0.9],
+        "tempo_p99_resolucao": quantiles[0.99]
+    }
+    stats = {
+        "total_registros": total,
+        "categorias_unicas": len(series["categoria"]),
+        "analistas_unicos": len(series["analista"]),
+        "grupos_solucionadores": df["Grupo Solucionador"].nunique() if "Grupo Solucionador" in df.columns else 0,
+        "periodo_inicio": periodo_inicio,
+        "periodo_fim": periodo_fim
+    }
+    return AggregationResult(kpis, stats, series, sketch)
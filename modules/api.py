@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from config.settings import API_HOST, API_PORT
+from modules.aggregation import SERIES_NAMES
+from modules.cache import normalize_filters
+from modules import instrumentation
+
+# API HTTP somente leitura com os KPIs, estatísticas e séries dos gráficos do dashboard, para
+# consumidores que só precisam dos números (painéis de parede, relatório semanal) sem rodar o
+# script do Streamlit. Os resultados saem do mesmo cache compartilhado do dashboard, chaveado pela
+# versão da base; o ETag de cada resposta também vem da versão, então enquanto não houver nova
+# ingestão um cliente com If-None-Match recebe 304 sem nenhum cálculo.
+#
+# Endpoints (GET), com os filtros do dashboard como parâmetros:
+#   /api/health                      versão atual da base
+#   /api/kpis                        ex.: /api/kpis?start_date=2025-06-01&end_date=2025-06-30
+#   /api/stats
+#   /api/series                      todas as séries dos gráficos
+#   /api/series/<nome>               ex.: /api/series/categoria?analyst=mariap&search=vpn
+#   /api/summary                     KPIs, estatísticas e séries
+#
+# Execução à parte do dashboard (outro processo lendo a mesma base): python -m modules.api --port 8502
+
+API_FILTERS = ["start_date", "end_date", "category", "analyst", "status", "search"]
+DATE_FILTERS = ["start_date", "end_date"]
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_filters(query):
+    # Parâmetros da URL -> filtros no formato do dashboard (mesmas chaves de cache)
+    params = parse_qs(query)
+    unknown = sorted(set(params) - set(API_FILTERS))
+    if unknown:
+        raise ApiError(400, f"Filtro desconhecido: {', '.join(unknown)}")
+    filters = {name: None for name in API_FILTERS}
+    for name, values in params.items():
+        value = values[-1]
+        if name in DATE_FILTERS:
+            try:
+                timestamp = pd.Timestamp(value)
+            except ValueError:
+                raise ApiError(400, f"Data inválida em {name}: {value}")
+            # "NaT", "nan" e afins viram NaT sem erro
+            if pd.isna(timestamp):
+                raise ApiError(400, f"Data inválida em {name}: {value}")
+            value = timestamp.date()
+        filters[name] = value
+    return filters
+
+
+def to_jsonable(value):
+    # Tipos do pandas/numpy em JSON: séries como lista de {rótulo, valor}, NaN como null
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, pd.DataFrame):
+        return [to_jsonable(record) for record in value.to_dict("records")]
+    if isinstance(value, pd.Series):
+        return [{"label": to_jsonable(label), "value": to_jsonable(item)} for label, item in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _series(aggregation, name=None):
+    # name já validado em _handle (contra SERIES_NAMES)
+    return aggregation.series if name is None else aggregation.series[name]
+
+
+# Recurso -> conteúdo a partir da agregação do recorte
+RESOURCES = {
+    "kpis": lambda aggregation, name: {"kpis": aggregation.kpis},
+    "stats": lambda aggregation, name: {"stats": aggregation.stats},
+    "series": lambda aggregation, name: {"series": _series(aggregation, name)},
+    "summary": lambda aggregation, name: {
+        "kpis": aggregation.kpis, "stats": aggregation.stats, "series": aggregation.series
+    }
+}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ITSMDashboardAPI/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        # Um span por recurso (caminhos desconhecidos num só nome, para não multiplicar as métricas)
+        resource = parts[1] if len(parts) > 1 and parts[0] == "api" else None
+        name = f"ApiRequestHandler.{resource if resource in RESOURCES or resource == 'health' else 'other'}"
+        with instrumentation.run_scope("api"), instrumentation.span(name, path=url.path) as current:
+            try:
+                status = self._handle(parts, url.query)
+            except ApiError as e:
+                status = e.status
+                self._send_json(status, {"error": str(e)})
+            except Exception as e:
+                logger.exception("Erro na API (%s)", self.path)
+                status = 500
+                self._send_json(status, {"error": str(e)})
+            current.set(status=status)
+
+    def _handle(self, parts, query):
+        processor = self.server.processor
+        if len(parts) < 2 or parts[0] != "api":
+            raise ApiError(404, "Recurso não encontrado")
+        resource, name = parts[1], (parts[2] if len(parts) > 2 else None)
+        if resource == "health":
+            self._send_json(200, {"status": "ok", "version": processor.get_dataset_version()})
+            return 200
+        if resource not in RESOURCES or len(parts) > 3 or (name is not None and resource != "series"):
+            raise ApiError(404, "Recurso não encontrado")
+        # Antes do cache: o nome vira parte do namespace (e do span) em processor.cached
+        if name is not None and name not in SERIES_NAMES:
+            raise ApiError(404, f"Série desconhecida: {name} (disponíveis: {', '.join(SERIES_NAMES)})")
+        filters = parse_filters(query)
+
+        # Revalidação antes de qualquer cálculo: só a leitura da versão da base
+        version = processor.get_dataset_version()
+        key = "/".join(parts[1:])
+        digest = hashlib.sha1(repr((key, normalize_filters(filters))).encode("utf-8")).hexdigest()[:16]
+        etag = f'"v{version}-{digest}"'
+        if self._matches(etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return 304
+
+        def build():
+            _, aggregation = processor.summarize(filters, version)
+            payload = {
+                "version": version,
+                "filters": dict(normalize_filters(filters)),
+                **RESOURCES[resource](aggregation, name)
+            }
+            return json.dumps(to_jsonable(payload), ensure_ascii=False).encode("utf-8")
+
+        body = processor.cached(f"api:{key}", filters, build, version=version)
+        self._send_json(200, body, etag)
+        return 200
+
+    def _matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        candidates = [candidate.strip() for candidate in header.split(",")]
+        return "*" in candidates or etag in [candidate.removeprefix("W/") for candidate in candidates]
+
+    def _send_json(self, status, payload, etag=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            # Sempre revalidar: o 304 custa só a consulta da versão da base
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ApiServer:
+    # Servidor HTTP com uma thread por requisição, numa thread própria (daemon) ao lado do dashboard
+    def __init__(self, processor, host=API_HOST, port=API_PORT):
+        self.httpd = ThreadingHTTPServer((host, port), ApiRequestHandler)
+        self.httpd.processor = processor
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="api", daemon=True)
+        self.thread.start()
+        logger.info("API disponível em http://%s:%s/api", *self.address[:2])
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_api_server(processor, host=API_HOST, port=API_PORT):
+    # None quando a API está desativada ou a porta já está em uso (ex.: outro processo do dashboard)
+    if port is None:
+        return None
+    try:
+        return ApiServer(processor, host, port).start()
+    except OSError as e:
+        logger.warning("API não iniciada em %s:%s: %s", host, port, e)
+        return None
+
+
+def main(argv=None):
+    from modules.data_processor import DataProcessor
+
+    parser = argparse.ArgumentParser(description="API somente leitura do ITSM Dashboard")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT or 8502)
+    parser.add_argument("--db-path", help="Base SQLite (padrão: DATABASE_PATH, a mesma do dashboard)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = ApiServer(DataProcessor(db_path=args.db_path), args.host, args.port)
+    logger.info("API disponível em http://%s:%s/api", *server.address[:2])
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
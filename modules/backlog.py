@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Backlog (chamados em aberto ao fim de cada dia) reconstruído a partir de "Data criação" e
+# "Data fechamento". Cada chamado vira um evento +1 no dia da criação e -1 no dia do fechamento;
+# a soma acumulada dos eventos, em ordem de dia, é o backlog diário. Os eventos são ordenados por
+# contagem (bincount por dia), então o custo é O(n + dias) por quebra, em vez de filtrar todos
+# os chamados uma vez por dia (O(dias x n)).
+#
+# Faixas de idade: o chamado entra na primeira faixa ao ser criado e muda de faixa no dia em que
+# passa de cada limite (evento -1 na faixa anterior, +1 na seguinte), enquanto estiver aberto.
+
+BACKLOG_DIMENSIONS = ["Categoria", "Prioridade", "Analista Responsável"]
+AGING_DIMENSION = "Idade"
+MISSING_LABEL = "Não informado"
+
+
+class BacklogResult:
+    # total: Series diária; breakdowns: DataFrame (dia x valor) por dimensão, incluindo as faixas de idade
+    def __init__(self, total, breakdowns):
+        self.total = total
+        self.breakdowns = breakdowns
+
+    @property
+    def empty(self):
+        return self.total.empty
+
+    def between(self, start_date=None, end_date=None):
+        # Recorte do período: o backlog do primeiro dia já inclui os chamados criados antes dele
+        start = pd.Timestamp(start_date) if start_date is not None else None
+        end = pd.Timestamp(end_date) if end_date is not None else None
+        return BacklogResult(
+            self.total.loc[start:end],
+            {name: frame.loc[start:end] for name, frame in self.breakdowns.items()}
+        )
+
+
+def aging_labels(aging_days):
+    # Ex.: [7, 30, 90] -> "0-7 dias", "8-30 dias", "31-90 dias", "> 90 dias"
+    lower = [0] + [limit + 1 for limit in aging_days]
+    labels = [f"{low}-{high} dias" for low, high in zip(lower, aging_days)]
+    return labels + [f"> {aging_days[-1]} dias"]
+
+
+def _sweep(groups, n_groups, n_days, plus_days, minus_groups, minus_days):
+    # Backlog por (grupo, dia): eventos agrupados por bincount e acumulados ao longo dos dias
+    events = np.bincount(groups * n_days + plus_days, minlength=n_groups * n_days).astype("int64")
+    events -= np.bincount(minus_groups * n_days + minus_days, minlength=n_groups * n_days).astype("int64")
+    return events.reshape(n_groups, n_days).cumsum(axis=1)
+
+
+def _day_numbers(series):
+    return series.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+
+
+def sweep_backlog(df, dimensions=BACKLOG_DIMENSIONS, aging_days=(7, 30, 90)):
+    # df: chamados com "Data criação", "Data fechamento" e as colunas das quebras
+    created = _day_numbers(df["Data criação"])
+    closed = _day_numbers(df["Data fechamento"])
+    known = ~np.isnat(created)
+    created, closed = created[known], closed[known]
+    empty_days = pd.DatetimeIndex([], name="Data")
+    if len(created) == 0:
+        return BacklogResult(
+            pd.Series(dtype="int64", index=empty_days, name="Chamados em Aberto"),
+            {name: pd.DataFrame(index=empty_days) for name in list(dimensions) + [AGING_DIMENSION]}
+        )
+
+    # Chamados sem fechamento seguem abertos até o último dia; fechamento antes da criação é tratado
+    # como fechamento no mesmo dia
+    has_end = ~np.isnat(closed)
+    closed = np.where(has_end, np.maximum(closed, created), created)
+    first = created.min()
+    last = max(created.max(), closed[has_end].max()) if has_end.any() else created.max()
+    n_days = int((last - first).astype("int64")) + 1
+    start = (created - first).astype("int64")
+    end = (closed - first).astype("int64")
+    days = pd.date_range(pd.Timestamp(first), periods=n_days, freq="D", name="Data")
+
+    zeros = np.zeros(len(start), dtype="int64")
+    total = _sweep(zeros, 1, n_days, start, zeros[has_end], end[has_end])[0]
+
+    breakdowns = {}
+    for column in dimensions:
+        if column not in df.columns:
+            continue
+        codes, uniques = pd.factorize(df[column][known], sort=True)
+        labels = [str(value) for value in uniques]
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(labels), codes)
+            labels.append(MISSING_LABEL)
+        counts = _sweep(codes, len(labels), n_days, start, codes[has_end], end[has_end])
+        breakdowns[column] = pd.DataFrame(counts.T, index=days, columns=labels)
+
+    # Faixas de idade: a mudança para a faixa k+1 acontece no dia criação + limite_k + 1, se o chamado
+    # ainda não tiver fechado antes disso (no próprio dia do fechamento a mudança e a saída se anulam)
+    limits = np.asarray(aging_days, dtype="int64")
+    n_groups = len(limits) + 1
+    plus_groups, plus_days = [zeros], [start]
+    minus_groups, minus_days = [], []
+    for k, limit in enumerate(limits):
+        moves = start + limit + 1
+        valid = (moves < n_days) & (~has_end | (moves <= end))
+        plus_groups.append(np.full(valid.sum(), k + 1))
+        plus_days.append(moves[valid])
+        minus_groups.append(np.full(valid.sum(), k))
+        minus_days.append(moves[valid])
+    closing_group = np.searchsorted(limits, end - start, side="left")
+    minus_groups.append(closing_group[has_end])
+    minus_days.append(end[has_end])
+    aging = _sweep(
+        np.concatenate(plus_groups), n_groups, n_days, np.concatenate(plus_days),
+        np.concatenate(minus_groups), np.concatenate(minus_days)
+    )
+    breakdowns[AGING_DIMENSION] = pd.DataFrame(aging.T, index=days, columns=aging_labels(list(aging_days)))
+
+    return BacklogResult(pd.Series(total, index=days, name="Chamados em Aberto"), breakdowns)
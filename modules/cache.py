@@ -0,0 +1,98 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def estimate_size(value):
+    # Tamanho aproximado em bytes, usado para o limite de memória do cache
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def normalize_filters(filters):
+    # Estado dos filtros em forma canônica e hashable (datas como texto ISO, sem filtros vazios)
+    normalized = []
+    for name, value in sorted(filters.items()):
+        if value is None:
+            continue
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+class VersionedCache:
+    # Cache LRU compartilhado entre sessões; as chaves incluem a versão da base de dados,
+    # então uma nova ingestão torna as entradas antigas inalcançáveis (e invalidate() as descarta)
+    def __init__(self, max_entries=256, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, namespace, version, key, compute):
+        cache_key = (namespace, version, key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key][0]
+            # Sessões concorrentes pedindo a mesma chave esperam um único cálculo
+            key_lock = self._inflight.setdefault(cache_key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if cache_key in self._entries:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return self._entries[cache_key][0]
+                self.misses += 1
+            try:
+                value = compute()
+                self._store(cache_key, value)
+            finally:
+                with self._lock:
+                    self._inflight.pop(cache_key, None)
+        return value
+
+    def _store(self, cache_key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._entries[cache_key] = (value, size)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def invalidate(self, keep_version=None):
+        # Remove as entradas de versões diferentes de keep_version (todas, se None)
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[1] != keep_version]:
+                _, size = self._entries.pop(cache_key)
+                self._total_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
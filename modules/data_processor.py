@@ -1,146 +1,1281 @@
 import pandas as pd
-import sqlite3
 import os
+import io
+import contextlib
+import hashlib
+import csv
+import gzip
+import tempfile
+import itertools
+import re
 import chardet
+import openpyxl
+from config.settings import (
+    INGEST_BATCH_SIZE, CSV_CHUNK_SIZE, CSV_SNIFF_BYTES, XLSX_HEADER_SCAN_ROWS, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, QUERY_CHUNK_SIZE,
+    EXPORT_CHUNK_SIZE, EXPORT_SPOOL_BYTES, STORAGE_BACKEND, SNAPSHOT_KEEP_VERSIONS, BACKLOG_AGING_DAYS, DATABASE_PATH
+)
+from modules.cache import VersionedCache, normalize_filters
+from modules.database import ConnectionPool
+from modules.aggregation import aggregate, ROLLUP_COUNT
+from modules.backlog import sweep_backlog, BACKLOG_DIMENSIONS
+from modules.sketches import QuantileSketch, bucket_of
+from modules.instrumentation import traced, annotate, span, row_count
 
-print("DEBUG: data_processor.py carregado")
+# Esquema tipado da tabela principal; a chave do chamado é única
+KEY_COLUMN = "PK Dataset Chamados"
+TABLE_SCHEMA = {
+    "PK Dataset Chamados": "INTEGER NOT NULL",
+    "Título requisição": "TEXT",
+    "Data criação": "TEXT",
+    "Data fechamento": "TEXT",
+    "Analista Responsável": "TEXT",
+    "Categoria": "TEXT",
+    "Prioridade": "TEXT",
+    "Status (descrição)": "TEXT",
+    "Flag Em Aberto": "TEXT",
+    "Tempo de Resolução (horas)": "REAL",
+    "Grau de Satisfação": "TEXT",
+    "Pesquisa de satisfação - comentário": "TEXT",
+    "SLA Atendido": "TEXT",
+    "Mês/Ano fechamento": "TEXT"
+}
+DATE_COLUMNS = ["Data criação", "Data fechamento"]
 
-class DataProcessor:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), "..", "data", "database", "itsm_data.db")
-        self._create_database_if_not_exists()
+# Partição lógica por mês de fechamento ("AAAA-MM"; no export vem como "AAAA/MM", no horário local).
+# Metadados por partição em itsm_partitions (ver _refresh_partitions); chamados sem fechamento
+# não pertencem a nenhuma partição
+PARTITION_COLUMN = "Mês/Ano fechamento"
 
-    def _create_database_if_not_exists(self):
-        print("DEBUG: Verificando/criando banco de dados")
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""CREATE TABLE IF NOT EXISTS itsm_data (
-            `PK Dataset Chamados` TEXT,
-            `Título requisição` TEXT,
-            `Data criação` TEXT,
-            `Data fechamento` TEXT,
-            `Analista Responsável` TEXT,
-            `Categoria` TEXT,
-            `Prioridade` TEXT,
-            `Status (descrição)` TEXT,
-            `Flag Em Aberto` TEXT,
-            `Tempo de Resolução (horas)` REAL,
-            `Grau de Satisfação` TEXT,
-            `SLA Atendido` TEXT
-        )""")
-        conn.commit()
-        conn.close()
-        print("DEBUG: Banco de dados verificado/criado")
-
-    def process_csv_file(self, file_path):
-        print(f"DEBUG: Processando arquivo CSV: {file_path}")
-        # Detectar a codificação do arquivo
-        with open(file_path, "rb") as f:
-            raw_data = f.read(10000)  # Ler os primeiros 10KB para detecção
-            detection = chardet.detect(raw_data)
-            encoding = detection["encoding"]
-            print(f"DEBUG: Codificação detectada: {encoding}")
-
-        # Tentar ler o CSV com diferentes delimitadores e cabeçalhos
+# Busca textual (filtro "search"): índice FTS5 sobre a própria tabela (conteúdo externo, rowid = chave
+# do chamado), sem diferenciar maiúsculas nem acentos ("impressao" encontra "Impressão")
+SEARCH_COLUMNS = ["Título requisição", "Pesquisa de satisfação - comentário"]
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Filtros do dashboard -> coluna da tabela
+FILTER_COLUMNS = {
+    "category": "Categoria",
+    "analyst": "Analista Responsável",
+    "status": "Flag Em Aberto"
+}
+FILTER_INDEXES = {
+    "idx_itsm_data_fechamento": "Data fechamento",
+    "idx_itsm_data_categoria": "Categoria",
+    "idx_itsm_data_analista": "Analista Responsável",
+    "idx_itsm_data_aberto": "Flag Em Aberto",
+    "idx_itsm_data_mes_fechamento": PARTITION_COLUMN
+}
+
+# Formatos de exportação: rótulo, tipo MIME e extensão do arquivo
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv", ".csv"),
+    "csv.gz": ("CSV compactado (gzip)", "application/gzip", ".csv.gz"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", ".parquet")
+}
+
+# Tabela pré-agregada (dia x dimensões) mantida na ingestão para KPIs e gráficos
+ROLLUP_DIMENSIONS = [
+    "Analista Responsável", "Categoria", "Prioridade", "SLA Atendido", "Grau de Satisfação", "Flag Em Aberto"
+]
+# ROLLUP_COUNT (contagem de chamados) vem de modules/aggregation.py, que lê as linhas desta tabela
+ROLLUP_MEASURES = {
+    ROLLUP_COUNT: ("INTEGER", "COUNT(*)"),
+    "Quantidade com Tempo": ("INTEGER", "COUNT(`Tempo de Resolução (horas)`)"),
+    "Soma Tempo (horas)": ("REAL", "SUM(`Tempo de Resolução (horas)`)"),
+    "Soma Quadrados Tempo (horas)": ("REAL", "SUM(`Tempo de Resolução (horas)` * `Tempo de Resolução (horas)`)")
+}
+
+# Representação compacta em memória (ver _compact)
+CATEGORICAL_COLUMNS = [
+    "Analista Responsável", "Categoria", "Prioridade", "Status (descrição)",
+    "Flag Em Aberto", "SLA Atendido", "Grau de Satisfação", PARTITION_COLUMN
+]
+FLAG_COLUMNS = ["Flag Em Aberto", "SLA Atendido"]
+FLAG_VALUES = {"Sim": True, "Não": False}
+
+# Sketches de quantis por dia x analista x categoria x flag em aberto (filtros do dashboard)
+SKETCH_DIMENSIONS = ["Analista Responsável", "Categoria", "Flag Em Aberto"]
+
+ROLLUP_FILTERS = ["start_date", "end_date", "category", "analyst", "status"]
+
+# Colunas relevantes para o dashboard (as demais colunas do export não são lidas)
+RELEVANT_COLUMNS = list(TABLE_SCHEMA.keys())
+
+# Colunas do export ITSM usadas quando o arquivo não traz o nome esperado pelo dashboard
+SOURCE_COLUMN_ALIASES = {
+    "PK Dataset Chamados": ["Chamados"],
+    "Tempo de Resolução (horas)": ["Tempo Total menos Resolvido (Horas)"],
+    "Grau de Satisfação": ["Pesquisa de satisfação - resposta"],
+    "SLA Atendido": ["Flag Atendeu SLA"]
+}
+
+# Normalização dos valores do export para os rótulos usados nos gráficos
+VALUE_ALIASES = {
+    "Flag Em Aberto": {"ABERTO": "Sim", "EM ABERTO": "Sim", "FECHADO": "Não"},
+    "SLA Atendido": {"ATENDEU O SLA": "Sim", "ATENDEU": "Sim", "NAO ATENDEU": "Não"},
+    "Grau de Satisfação": {"Otimo": "Ótimo", "Pessimo": "Péssimo"}
+}
+
+class ExportParser:
+    # Leitura dos exports (CSV/XLSX) em blocos já limpos e tipados, sem acesso à base:
+    # usado direto pelos processos de leitura da carga em lote (bulk_load.py)
+    @staticmethod
+    @contextlib.contextmanager
+    def _open_source(source):
+        # Aceita caminho em disco, bytes/memoryview (buffer do upload) ou objeto file-like binário
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                yield f
+            return
+        if isinstance(source, memoryview):
+            # BytesIO reaproveita o buffer de um objeto bytes sem copiá-lo
+            source = source.obj if isinstance(source.obj, bytes) and source.nbytes == len(source.obj) else source.tobytes()
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        source.seek(0)
+        yield source
+
+    @staticmethod
+    def _source_size(f):
+        position = f.tell()
+        size = f.seek(0, io.SEEK_END)
+        f.seek(position)
+        return size
+
+    @traced()
+    def sniff_csv(self, source):
+        # Detecta codificação, preâmbulo ("Refinamentos:") e delimitador a partir de um prefixo do arquivo
+        with self._open_source(source) as f:
+            prefix = f.read(CSV_SNIFF_BYTES)
+        encoding = chardet.detect(prefix)["encoding"] or "utf-8"
+        if encoding.lower() == "ascii":
+            encoding = "utf-8"
+
+        lines = prefix.decode(encoding, errors="replace").lstrip("\ufeff").splitlines()
+        skiprows = 0
+        refinements = {}
+        if lines and lines[0].startswith(("Refinamentos:", "Refinements:")):
+            # Ex.: "Refinamentos:,Mês/Ano fechamento:,2025/06"; com mais de um refinamento os seguintes
+            # vêm em linhas próprias iniciadas pelo delimitador (",Mês/Ano abertura:,2025/03")
+            skiprows = 1
+            while skiprows < len(lines) and lines[skiprows][:1] in (",", ";"):
+                skiprows += 1
+            for line in lines[:skiprows]:
+                fields = [field.strip() for field in line.replace(";", ",").split(",")[1:]]
+                for name, value in zip(fields[0::2], fields[1::2]):
+                    if name:
+                        refinements[name.rstrip(":")] = value
+
+        header_line = lines[skiprows] if len(lines) > skiprows else ""
         try:
-            df = pd.read_csv(file_path, encoding=encoding, sep=",", skiprows=1) # Tenta pular a primeira linha
-            print("DEBUG: CSV lido com vírgula e skiprows=1")
-        except Exception as e:
-            print(f"DEBUG: Erro ao ler com vírgula e skiprows=1: {e}")
+            delimiter = csv.Sniffer().sniff(header_line, delimiters=",;\t|").delimiter
+        except csv.Error:
+            delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+        header = [col.strip() for col in next(csv.reader([header_line], delimiter=delimiter), [])]
+        annotate(encoding=encoding, delimiter=delimiter, skiprows=skiprows, columns=len(header))
+        return {
+            "encoding": encoding,
+            "delimiter": delimiter,
+            "skiprows": skiprows,
+            "header": header,
+            "refinements": refinements
+        }
+
+    @staticmethod
+    def _parse_months(values):
+        # "2025/06" (export) -> "2025-06"; None quando o valor não é um mês.
+        # A expressão regular roda só nos valores distintos (poucos meses por arquivo), depois é expandida
+        codes, uniques = pd.factorize(values.astype("string"))
+        parts = pd.Series(uniques, dtype="string").str.extract(r"(\d{4})\D(\d{1,2})")
+        months = (parts[0] + "-" + parts[1].str.zfill(2)).array
+        return pd.Series(months.take(codes, allow_fill=True), index=values.index, dtype="string")
+
+    @staticmethod
+    def _format_months(dates):
+        # Datas -> "AAAA-MM" pelo período mensal, formatando só os meses distintos
+        codes, uniques = pd.factorize(dates.dt.to_period("M"))
+        months = pd.array(uniques.strftime("%Y-%m"), dtype="string")
+        return pd.Series(months.take(codes, allow_fill=True), index=dates.index, dtype="string")
+
+    def declared_partitions(self, source, file_name=None):
+        # Meses de fechamento que o arquivo traz por inteiro: export refinado só por "Mês/Ano fechamento".
+        # Com outros refinamentos (ex.: também por mês de abertura) o arquivo é parte do mês e não o substitui.
+        # As planilhas não trazem o preâmbulo de refinamentos na aba de dados.
+        name = file_name or (source if isinstance(source, (str, os.PathLike)) else "")
+        if os.fspath(name).lower().endswith((".xlsx", ".xlsm")):
+            return []
+        refinements = self.sniff_csv(source)["refinements"]
+        if set(refinements) != {PARTITION_COLUMN}:
+            return []
+        months = self._parse_months(pd.Series(re.findall(r"\d{4}\D\d{1,2}", refinements[PARTITION_COLUMN])))
+        return sorted(set(months.dropna()))
+
+    @staticmethod
+    def _resolve_columns(header):
+        # Posição da primeira ocorrência de cada coluna relevante (o export repete "PK Dataset Chamados")
+        positions = {}
+        for target in RELEVANT_COLUMNS:
+            for source in [target] + SOURCE_COLUMN_ALIASES.get(target, []):
+                if source in header:
+                    positions[header.index(source)] = target
+                    break
+        return positions
+
+    @traced()
+    def iter_csv_chunks(self, source, progress=None):
+        dialect = self.sniff_csv(source)
+        positions = self._resolve_columns(dialect["header"])
+        if KEY_COLUMN not in positions.values():
+            raise ValueError(f"Coluna obrigatória '{KEY_COLUMN}' não encontrada no arquivo")
+
+        usecols = sorted(positions)
+        names = [positions[pos] for pos in usecols]
+        dtypes = {col: ("float64" if TABLE_SCHEMA[col] == "REAL" else "string") for col in names}
+
+        with self._open_source(source) as f:
+            total_bytes = self._source_size(f) or 1
+            reader = pd.read_csv(
+                f,
+                encoding=dialect["encoding"],
+                encoding_errors="replace",
+                sep=dialect["delimiter"],
+                skiprows=dialect["skiprows"] + 1,
+                header=None,
+                names=names,
+                usecols=usecols,
+                dtype=dtypes,
+                chunksize=CSV_CHUNK_SIZE
+            )
+            rows_read = 0
+            for chunk in reader:
+                chunk = self._clean_chunk(chunk)
+                rows_read += len(chunk)
+                if progress is not None:
+                    progress(rows_read, min(f.tell() / total_bytes, 1.0))
+                yield chunk
+
+    @traced()
+    def iter_xlsx_chunks(self, source, progress=None):
+        # Leitura em modo read_only (streaming): as linhas da planilha nunca ficam todas em memória
+        with self._open_source(source) as f:
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
             try:
-                df = pd.read_csv(file_path, encoding=encoding, sep=";", skiprows=1) # Tenta com ponto e vírgula
-                print("DEBUG: CSV lido com ponto e vírgula e skiprows=1")
-            except Exception as e:
-                print(f"DEBUG: Erro ao ler com ponto e vírgula e skiprows=1: {e}")
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding, sep=",") # Tenta sem pular linha
-                    print("DEBUG: CSV lido com vírgula e sem skiprows")
-                except Exception as e:
-                    print(f"DEBUG: Erro ao ler com vírgula e sem skiprows: {e}")
-                    df = pd.read_csv(file_path, encoding=encoding, sep=";") # Tenta com ponto e vírgula sem pular linha
-                    print("DEBUG: CSV lido com ponto e vírgula e sem skiprows")
-
-        # Padronizar nomes de colunas para facilitar o acesso
-        df.columns = df.columns.str.strip().str.replace(" ", "_").str.replace("(", "").str.replace(")", "")
-        df.rename(columns={
-            "PK_Dataset_Chamados": "PK Dataset Chamados".replace(" ", "_"),
-            "Título_requisição": "Título requisição".replace(" ", "_"),
-            "Data_criação": "Data criação".replace(" ", "_"),
-            "Data_fechamento": "Data fechamento".replace(" ", "_"),
-            "Analista_Responsável": "Analista Responsável".replace(" ", "_"),
-            "Status_descrição": "Status (descrição)".replace(" ", "_"),
-            "Flag_Em_Aberto": "Flag Em Aberto".replace(" ", "_"),
-            "Tempo_de_Resolução_horas": "Tempo de Resolução (horas)".replace(" ", "_"),
-            "Grau_de_Satisfação": "Grau de Satisfação".replace(" ", "_"),
-            "SLA_Atendido": "SLA Atendido".replace(" ", "_")
-        }, inplace=True)
+                sheet, header_row, positions = self._find_data_sheet(workbook)
+                annotate(sheet=sheet.title, header_row=header_row)
+                usecols = sorted(positions)
+                names = [positions[pos] for pos in usecols]
+                total_rows = max((sheet.max_row or 0) - header_row, 1)
 
-        # Limpeza e conversão de tipos
-        print("DEBUG: Limpando e convertendo tipos de dados")
-        for col in ["Data criação", "Data fechamento"]:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        
-        if "Tempo de Resolução (horas)" in df.columns:
-            df["Tempo de Resolução (horas)"] = pd.to_numeric(df["Tempo de Resolução (horas)"], errors="coerce")
-
-        # Filtrar colunas relevantes para o dashboard
-        relevant_columns = [
-            "PK Dataset Chamados", "Título requisição", "Data criação", "Data fechamento",
-            "Analista Responsável", "Categoria", "Prioridade", "Status (descrição)",
-            "Flag Em Aberto", "Tempo de Resolução (horas)", "Grau de Satisfação", "SLA Atendido"
-        ]
-        df = df[[col for col in relevant_columns if col in df.columns]]
-        print(f"DEBUG: DataFrame processado com {len(df)} linhas e {len(df.columns)} colunas")
+                rows_read = 0
+                rows = sheet.iter_rows(min_row=header_row + 1, values_only=True)
+                while True:
+                    batch = [
+                        [row[pos] if pos < len(row) else None for pos in usecols]
+                        for row in itertools.islice(rows, CSV_CHUNK_SIZE)
+                    ]
+                    if not batch:
+                        break
+                    chunk = self._clean_chunk(self._typed_frame(batch, names))
+                    rows_read += len(chunk)
+                    if progress is not None:
+                        progress(rows_read, min(rows_read / total_rows, 1.0))
+                    yield chunk
+            finally:
+                workbook.close()
+
+    def _find_data_sheet(self, workbook):
+        # A planilha de dados é a maior que traz as colunas do export no cabeçalho; as demais
+        # (tabelas dinâmicas e seus detalhamentos) repetem subconjuntos dela ou não são tabulares
+        candidates = []
+        for sheet in workbook.worksheets:
+            for row_number, row in enumerate(sheet.iter_rows(max_row=XLSX_HEADER_SCAN_ROWS, values_only=True), 1):
+                header = [str(value).strip() if value is not None else "" for value in row]
+                positions = self._resolve_columns(header)
+                if KEY_COLUMN in positions.values():
+                    candidates.append((sheet.max_row or 0, sheet, row_number, positions))
+                    break
+        if not candidates:
+            raise ValueError(f"Nenhuma planilha com a coluna obrigatória '{KEY_COLUMN}'")
+        _, sheet, header_row, positions = max(candidates, key=lambda candidate: candidate[0])
+        return sheet, header_row, positions
+
+    @staticmethod
+    def _typed_frame(rows, names):
+        # Células do Excel chegam como str, número ou datetime: mesmos tipos da leitura do CSV
+        df = pd.DataFrame(rows, columns=names, dtype=object)
+        for col in names:
+            if TABLE_SCHEMA[col] == "REAL":
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+            else:
+                df[col] = df[col].astype("string").replace("", pd.NA)
         return df
 
-    def save_to_database(self, df):
-        print("DEBUG: Salvando dados no banco de dados")
-        conn = sqlite3.connect(self.db_path)
-        df.to_sql("itsm_data", conn, if_exists="replace", index=False)
-        conn.close()
-        print("DEBUG: Dados salvos no banco de dados")
+    def iter_file_chunks(self, source, progress=None, file_name=None):
+        # Escolhe o leitor pela extensão do arquivo (caminho em disco ou nome do upload)
+        name = file_name or (source if isinstance(source, (str, os.PathLike)) else "")
+        if os.fspath(name).lower().endswith((".xlsx", ".xlsm")):
+            return self.iter_xlsx_chunks(source, progress)
+        return self.iter_csv_chunks(source, progress)
 
-    def load_from_database(self):
-        print("DEBUG: Carregando dados do banco de dados")
-        conn = sqlite3.connect(self.db_path)
-        df = pd.read_sql_query("SELECT * FROM itsm_data", conn)
-        conn.close()
-        
-        # Converter colunas de data novamente
-        for col in ["Data criação", "Data fechamento"]:
+    def _clean_chunk(self, df):
+        # Limpeza e conversão de tipos
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = self._parse_dates(df[col])
+        for col, mapping in VALUE_ALIASES.items():
             if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        print(f"DEBUG: Dados carregados do banco de dados: {len(df)} linhas")
+                df[col] = df[col].replace(mapping)
+        # Mês de fechamento do export; sem a coluna (ou sem valor), o da data de fechamento
+        months = self._parse_months(df[PARTITION_COLUMN]) if PARTITION_COLUMN in df.columns else None
+        if "Data fechamento" in df.columns:
+            derived = self._format_months(df["Data fechamento"])
+            months = derived if months is None else months.fillna(derived)
+        if months is not None:
+            df[PARTITION_COLUMN] = months
         return df
 
-    def calculate_kpis(self, df):
-        print("DEBUG: Calculando KPIs")
-        total_chamados = len(df)
-        chamados_abertos = df[df["Flag Em Aberto"] == "Sim"] if "Flag Em Aberto" in df.columns else pd.DataFrame()
-        sla_atendido = df[df["SLA Atendido"] == "Sim"] if "SLA Atendido" in df.columns else pd.DataFrame()
-        
-        kpis = {
-            "total_chamados": total_chamados,
-            "chamados_abertos": len(chamados_abertos),
-            "sla_atendido_percent": (len(sla_atendido) / total_chamados * 100) if total_chamados > 0 else 0,
-            "tempo_medio_resolucao": df["Tempo de Resolução (horas)"].mean() if "Tempo de Resolução (horas)" in df.columns else 0
+    @traced()
+    def process_csv_file(self, source, progress=None):
+        return pd.concat(list(self.iter_csv_chunks(source, progress)), ignore_index=True)
+
+    @staticmethod
+    def _parse_dates(series):
+        # O export usa ISO 8601 em UTC ("...Z"); armazenamos sem fuso para comparar com os filtros
+        return pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None)
+
+
+class DataProcessor(ExportParser):
+    def __init__(self, db_path=None):
+        # db_path permite usar outra base (ex.: benchmarks); o padrão é DATABASE_PATH ou a base do dashboard
+        self.db_path = db_path or DATABASE_PATH or os.path.join(
+            os.path.dirname(__file__), "..", "data", "database", "itsm_data.db"
+        )
+        self.cache = VersionedCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.pool = ConnectionPool(self.db_path)
+        self._create_database_if_not_exists()
+        self.snapshots = None
+        if STORAGE_BACKEND == "parquet":
+            from modules.snapshots import ParquetSnapshotStore
+            self.snapshots = ParquetSnapshotStore(
+                os.path.join(os.path.dirname(self.db_path), "snapshots"), self._snapshot_schema(),
+                keep_versions=SNAPSHOT_KEEP_VERSIONS
+            )
+
+    @traced()
+    def _create_database_if_not_exists(self):
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            self._migrate_legacy_table(cursor)
+            cursor.execute(self._create_table_sql("itsm_data"))
+            self._add_missing_columns(cursor, "itsm_data", TABLE_SCHEMA)
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_itsm_data_pk ON itsm_data (`{KEY_COLUMN}`)")
+            # Índices usados pelos filtros do dashboard (ver query)
+            for index_name, column in FILTER_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON itsm_data (`{column}`)")
+            # Paginação por chave (ver fetch_page) na ordenação padrão da tabela detalhada; nas demais
+            # colunas de ordenação cada página ainda ordena o resultado filtrado inteiro
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_itsm_data_fechamento_pk ON itsm_data "
+                f"({self._sort_expression('Data fechamento')}, `{KEY_COLUMN}`)"
+            )
+            rollup_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itsm_rollup'"
+            ).fetchone() is not None
+            rollup_columns = ",\n            ".join(
+                ["`Data fechamento` TEXT"]
+                + [f"`{col}` TEXT" for col in ROLLUP_DIMENSIONS]
+                + [f"`{col}` {col_type}" for col, (col_type, _) in ROLLUP_MEASURES.items()]
+            )
+            cursor.execute(f"""CREATE TABLE IF NOT EXISTS itsm_rollup (
+                {rollup_columns}
+            )""")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_itsm_rollup_fechamento ON itsm_rollup (`Data fechamento`)")
+            # Sketches de quantis do tempo de resolução: contagem por bucket logarítmico
+            sketch_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itsm_resolution_sketch'"
+            ).fetchone() is not None
+            sketch_columns = ",\n            ".join(
+                ["`Data fechamento` TEXT"] + [f"`{col}` TEXT" for col in SKETCH_DIMENSIONS]
+                + ["`Bucket` INTEGER", f"`{ROLLUP_COUNT}` INTEGER"]
+            )
+            cursor.execute(f"""CREATE TABLE IF NOT EXISTS itsm_resolution_sketch (
+                {sketch_columns}
+            )""")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_itsm_sketch_fechamento ON itsm_resolution_sketch (`Data fechamento`)"
+            )
+            if not rollup_exists or not sketch_exists:
+                self._refresh_rollup(cursor, full=True)
+            # Índice da busca textual; bases anteriores a ele são indexadas por inteiro na criação
+            search_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itsm_search'"
+            ).fetchone() is not None
+            if not search_exists:
+                search_columns = ", ".join(f"`{col}`" for col in SEARCH_COLUMNS)
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE itsm_search USING fts5({search_columns}, content='itsm_data', "
+                    f"content_rowid='{KEY_COLUMN}', tokenize='{SEARCH_TOKENIZER}')"
+                )
+                cursor.execute("INSERT INTO itsm_search (itsm_search) VALUES ('rebuild')")
+            # Metadados das partições por mês de fechamento: contagens e limites das datas
+            partitions_exist = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itsm_partitions'"
+            ).fetchone() is not None
+            cursor.execute("""CREATE TABLE IF NOT EXISTS itsm_partitions (
+                `month` TEXT PRIMARY KEY,
+                `row_count` INTEGER,
+                `closed_rows` INTEGER,
+                `min_fechamento` TEXT,
+                `max_fechamento` TEXT,
+                `min_criacao` TEXT,
+                `max_criacao` TEXT,
+                `version` INTEGER
+            )""")
+            # Versão da base de dados: incrementada a cada ingestão que altera dados (chave dos caches)
+            cursor.execute("""CREATE TABLE IF NOT EXISTS dataset_meta (
+                `key` TEXT PRIMARY KEY,
+                `value` INTEGER
+            )""")
+            cursor.execute("INSERT OR IGNORE INTO dataset_meta (key, value) VALUES ('version', 0)")
+            if not partitions_exist:
+                # Bases anteriores às partições: o mês vem da data de fechamento
+                cursor.execute(
+                    f"UPDATE itsm_data SET `{PARTITION_COLUMN}` = substr(`Data fechamento`, 1, 7) "
+                    f"WHERE `{PARTITION_COLUMN}` IS NULL AND `Data fechamento` IS NOT NULL"
+                )
+                self._refresh_partitions(cursor)
+            # Registro dos arquivos já ingeridos (evita reprocessar o mesmo upload)
+            cursor.execute("""CREATE TABLE IF NOT EXISTS ingest_ledger (
+                `file_hash` TEXT PRIMARY KEY,
+                `file_name` TEXT,
+                `file_size` INTEGER,
+                `row_count` INTEGER,
+                `ingested_at` TEXT
+            )""")
+            # Fila de ingestões em segundo plano (ver modules/ingest_worker.py)
+            cursor.execute("""CREATE TABLE IF NOT EXISTS ingest_jobs (
+                `job_id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                `file_name` TEXT,
+                `file_hash` TEXT,
+                `file_size` INTEGER,
+                `status` TEXT,
+                `progress` REAL,
+                `rows_read` INTEGER,
+                `inserted` INTEGER,
+                `updated` INTEGER,
+                `unchanged` INTEGER,
+                `removed` INTEGER,
+                `partitions` TEXT,
+                `error` TEXT,
+                `submitted_at` TEXT,
+                `started_at` TEXT,
+                `finished_at` TEXT,
+                `parse_seconds` REAL,
+                `write_seconds` REAL
+            )""")
+            self._add_missing_columns(cursor, "ingest_jobs", {"removed": "INTEGER", "partitions": "TEXT"})
+
+    @staticmethod
+    def _create_table_sql(table_name, temporary=False):
+        columns = ",\n            ".join(f"`{col}` {col_type}" for col, col_type in TABLE_SCHEMA.items())
+        temp = "TEMP " if temporary else ""
+        return f"""CREATE {temp}TABLE IF NOT EXISTS {table_name} (
+            {columns}
+        )"""
+
+    @staticmethod
+    def _add_missing_columns(cursor, table, columns):
+        # Colunas criadas depois da tabela (CREATE TABLE IF NOT EXISTS não altera tabelas existentes)
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for col, col_type in columns.items():
+            if col not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN `{col}` {col_type.replace(' NOT NULL', '')}")
+
+    def _migrate_legacy_table(self, cursor):
+        # Versões anteriores recriavam a tabela via to_sql (sem tipos e sem chave única)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itsm_data'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_itsm_data_pk'")
+        if cursor.fetchone() is not None:
+            return
+
+        annotate(legacy_migration=True)
+        cursor.execute("PRAGMA table_info(itsm_data)")
+        legacy_columns = [row[1] for row in cursor.fetchall()]
+        cursor.execute("ALTER TABLE itsm_data RENAME TO itsm_data_legacy")
+        cursor.execute(self._create_table_sql("itsm_data"))
+        cursor.execute(f"CREATE UNIQUE INDEX idx_itsm_data_pk ON itsm_data (`{KEY_COLUMN}`)")
+        if KEY_COLUMN in legacy_columns:
+            common = ", ".join(f"`{col}`" for col in TABLE_SCHEMA if col in legacy_columns)
+            cursor.execute(
+                f"INSERT OR REPLACE INTO itsm_data ({common}) SELECT {common} FROM itsm_data_legacy "
+                f"WHERE `{KEY_COLUMN}` IS NOT NULL"
+            )
+        cursor.execute("DROP TABLE itsm_data_legacy")
+
+    @staticmethod
+    def fingerprint(data):
+        # Hash do conteúdo do arquivo; identifica o upload independente do nome
+        return hashlib.sha256(data).hexdigest()
+
+    def get_ingestion(self, file_hash):
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT file_name, file_size, row_count, ingested_at FROM ingest_ledger WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"file_name": row[0], "file_size": row[1], "row_count": row[2], "ingested_at": row[3]}
+
+    def record_ingestion(self, file_hash, file_name, file_size, row_count):
+        with self.pool.writer() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_ledger (file_hash, file_name, file_size, row_count, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (file_hash, file_name, file_size, row_count, pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+    def create_job(self, file_name, file_hash, file_size):
+        with self.pool.writer() as conn:
+            cursor = conn.execute(
+                "INSERT INTO ingest_jobs (file_name, file_hash, file_size, status, progress, rows_read, submitted_at) "
+                "VALUES (?, ?, ?, 'queued', 0, 0, ?)",
+                (file_name, file_hash, file_size, pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            job_id = cursor.lastrowid
+        return job_id
+
+    def update_job(self, job_id, **fields):
+        assignments = ", ".join(f"`{name}` = ?" for name in fields)
+        with self.pool.writer() as conn:
+            conn.execute(f"UPDATE ingest_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def get_jobs(self, limit=10):
+        with self.pool.reader() as conn:
+            jobs = pd.read_sql_query("SELECT * FROM ingest_jobs ORDER BY job_id DESC LIMIT ?", conn, params=(limit,))
+        return jobs.to_dict("records")
+
+    def get_active_job(self, file_hash):
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT job_id FROM ingest_jobs WHERE file_hash = ? AND status IN ('queued', 'parsing', 'writing')",
+                (file_hash,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def fail_interrupted_jobs(self):
+        # Jobs que ficaram em andamento quando o processo anterior terminou não vão mais concluir
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'failed', error = 'Interrompido (servidor reiniciado)', finished_at = ? "
+                "WHERE status IN ('queued', 'parsing', 'writing')",
+                (pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+
+    def _to_records(self, df):
+        out = df.reindex(columns=list(TABLE_SCHEMA.keys()))
+        out[KEY_COLUMN] = pd.to_numeric(out[KEY_COLUMN], errors="coerce")
+        out = out.dropna(subset=[KEY_COLUMN])
+        out[KEY_COLUMN] = out[KEY_COLUMN].astype("int64")
+        for col in DATE_COLUMNS:
+            if pd.api.types.is_datetime64_any_dtype(out[col]):
+                out[col] = out[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+        out = out.astype(object).where(out.notna(), None)
+        return out
+
+    @traced()
+    def save_to_database(self, data, mode="upsert", partitions=None):
+        # data: DataFrame ou iterável de DataFrames (ex.: iter_csv_chunks), gravado sem concatenar em memória
+        # mode="upsert": insere/atualiza por chave do chamado; mode="replace": substitui todo o conteúdo
+        # partitions: meses ("AAAA-MM") que o arquivo traz por inteiro (ver declared_partitions); no upsert,
+        # os chamados desses meses que não estão no arquivo são removidos (a partição é substituída)
+        partitions = list(partitions or []) if mode != "replace" else []
+        annotate(mode=mode, partitions=",".join(partitions) or None)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        columns = list(TABLE_SCHEMA.keys())
+        column_list = ", ".join(f"`{col}`" for col in columns)
+        placeholders = ", ".join("?" for _ in columns)
+
+        with self.pool.dedicated() as conn:
+            cursor = conn.cursor()
+            with span("DataProcessor.save_to_database.staging") as staging:
+                # Carrega os lotes numa tabela temporária da conexão dedicada: enquanto o arquivo é lido,
+                # a base principal não fica bloqueada
+                cursor.execute("DROP TABLE IF EXISTS temp.itsm_staging")
+                cursor.execute(self._create_table_sql("itsm_staging", temporary=True))
+                cursor.execute(f"CREATE UNIQUE INDEX temp.idx_itsm_staging_pk ON itsm_staging (`{KEY_COLUMN}`)")
+                rows_read = 0
+                for chunk in chunks:
+                    rows_read += len(chunk)
+                    rows = self._to_records(chunk).itertuples(index=False, name=None)
+                    while True:
+                        batch = list(itertools.islice(rows, INGEST_BATCH_SIZE))
+                        if not batch:
+                            break
+                        # Chaves repetidas no arquivo: prevalece a última ocorrência
+                        cursor.executemany(
+                            f"INSERT OR REPLACE INTO itsm_staging ({column_list}) VALUES ({placeholders})",
+                            batch
+                        )
+                staged = cursor.execute("SELECT COUNT(*) FROM itsm_staging").fetchone()[0]
+                conn.commit()
+                staging.rows_in, staging.rows_out = rows_read, staged
+
+            # Merge em SQL numa única transação, com o lock do escritor único: as leituras continuam
+            # vendo a versão anterior até o commit (o span inclui a espera pelo lock)
+            with span("DataProcessor.save_to_database.merge", rows_in=staged) as merge, self.pool.writer(conn):
+                cursor.execute("BEGIN IMMEDIATE")
+                if mode == "replace":
+                    cursor.execute("DELETE FROM itsm_data")
+                    # Os arquivos já ingeridos saíram junto com os dados: podem ser carregados de novo
+                    cursor.execute("DELETE FROM ingest_ledger")
+                else:
+                    # Dias cujo agregado muda: os do arquivo e os antigos dos chamados que serão atualizados
+                    cursor.execute("DROP TABLE IF EXISTS temp.rollup_days")
+                    cursor.execute(f"""CREATE TEMP TABLE rollup_days AS
+                        SELECT substr(`Data fechamento`, 1, 10) AS dia FROM itsm_staging
+                        UNION
+                        SELECT substr(d.`Data fechamento`, 1, 10) FROM itsm_data d
+                        JOIN itsm_staging s ON d.`{KEY_COLUMN}` = s.`{KEY_COLUMN}`""")
+
+                removed = 0
+                if partitions:
+                    # Chamados das partições substituídas que saíram do export (os dias deles também mudam)
+                    marks = ", ".join("?" for _ in partitions)
+                    stale = (
+                        f"`{PARTITION_COLUMN}` IN ({marks}) "
+                        f"AND `{KEY_COLUMN}` NOT IN (SELECT `{KEY_COLUMN}` FROM itsm_staging)"
+                    )
+                    cursor.execute(
+                        f"INSERT INTO rollup_days SELECT substr(`Data fechamento`, 1, 10) FROM itsm_data "
+                        f"WHERE {stale} EXCEPT SELECT dia FROM rollup_days",
+                        partitions
+                    )
+                    self._unindex_search(cursor, f"FROM itsm_data d WHERE {stale}", partitions)
+                    cursor.execute(f"DELETE FROM itsm_data WHERE {stale}", partitions)
+                    removed = cursor.rowcount
+                    merge.set(removed=removed)
+
+                # Partições cujos metadados mudam: as do arquivo, as antigas dos chamados atualizados e as substituídas
+                affected = None
+                if mode != "replace":
+                    affected = sorted(set(partitions) | {
+                        row[0] for row in cursor.execute(
+                            f"SELECT `{PARTITION_COLUMN}` FROM itsm_staging UNION "
+                            f"SELECT d.`{PARTITION_COLUMN}` FROM itsm_data d "
+                            f"JOIN itsm_staging s ON d.`{KEY_COLUMN}` = s.`{KEY_COLUMN}`"
+                        ) if row[0] is not None
+                    })
+
+                    # Busca textual: chamados novos ou com texto alterado saem do índice (com o texto antigo)
+                    # e voltam com o novo depois do merge; os demais não tocam no índice
+                    text_differs = " OR ".join(f"d.`{col}` IS NOT s.`{col}`" for col in SEARCH_COLUMNS)
+                    cursor.execute("DROP TABLE IF EXISTS temp.search_keys")
+                    cursor.execute(f"""CREATE TEMP TABLE search_keys AS
+                        SELECT s.`{KEY_COLUMN}` AS chave FROM itsm_staging s
+                        LEFT JOIN itsm_data d ON d.`{KEY_COLUMN}` = s.`{KEY_COLUMN}`
+                        WHERE d.`{KEY_COLUMN}` IS NULL OR {text_differs}""")
+                    self._unindex_search(cursor, f"FROM itsm_data d JOIN search_keys k ON d.`{KEY_COLUMN}` = k.chave")
+
+                existing = cursor.execute(
+                    f"SELECT COUNT(*) FROM itsm_staging s JOIN itsm_data d ON d.`{KEY_COLUMN}` = s.`{KEY_COLUMN}`"
+                ).fetchone()[0]
+                changes_before = conn.total_changes
+                updates = ", ".join(f"`{col}` = excluded.`{col}`" for col in columns if col != KEY_COLUMN)
+                differs = " OR ".join(f"itsm_data.`{col}` IS NOT excluded.`{col}`" for col in columns if col != KEY_COLUMN)
+                cursor.execute(
+                    f"INSERT INTO itsm_data ({column_list}) SELECT {column_list} FROM itsm_staging WHERE true "
+                    f"ON CONFLICT(`{KEY_COLUMN}`) DO UPDATE SET {updates} WHERE {differs}"
+                )
+                changed = conn.total_changes - changes_before
+                merge.rows_out = changed
+                if mode == "replace":
+                    cursor.execute("INSERT INTO itsm_search (itsm_search) VALUES ('rebuild')")
+                else:
+                    search_list = ", ".join(f"`{col}`" for col in SEARCH_COLUMNS)
+                    cursor.execute(
+                        f"INSERT INTO itsm_search (rowid, {search_list}) SELECT d.`{KEY_COLUMN}`, "
+                        + ", ".join(f"d.`{col}`" for col in SEARCH_COLUMNS)
+                        + f" FROM itsm_data d JOIN search_keys k ON d.`{KEY_COLUMN}` = k.chave"
+                    )
+                    merge.set(search_indexed=cursor.rowcount)
+                    cursor.execute("DROP TABLE temp.search_keys")
+                months = None
+                if mode != "replace":
+                    months = [row[0] for row in cursor.execute("SELECT DISTINCT substr(dia, 1, 7) FROM rollup_days")]
+                self._refresh_rollup(cursor, full=(mode == "replace"))
+                cursor.execute("DROP TABLE temp.itsm_staging")
+                modified = changed > 0 or removed > 0 or mode == "replace"
+                if modified:
+                    cursor.execute("UPDATE dataset_meta SET value = value + 1 WHERE key = 'version'")
+                    self._refresh_partitions(cursor, affected)
+
+        self.cache.invalidate(self.get_dataset_version())
+        if self.snapshots is not None and modified:
+            self._refresh_snapshot(months)
+        inserted = staged - existing
+        updated = changed - inserted
+        result = {
+            "rows": rows_read, "inserted": inserted, "updated": updated, "unchanged": existing - updated,
+            "removed": removed, "partitions": partitions
         }
-        print("DEBUG: KPIs calculados")
-        return kpis
+        annotate(rows_in=rows_read, rows_out=changed + removed, inserted=inserted, updated=updated, removed=removed)
+        return result
 
-    def get_summary_stats(self, df):
-        print("DEBUG: Obtendo estatísticas de resumo")
-        stats = {
-            "total_registros": len(df),
-            "categorias_unicas": df["Categoria"] .nunique() if "Categoria" in df.columns else 0,
-            "analistas_unicos": df["Analista Responsável"] .nunique() if "Analista Responsável" in df.columns else 0,
-            "grupos_solucionadores": df["Grupo Solucionador"] .nunique() if "Grupo Solucionador" in df.columns else 0,
-            "periodo_inicio": df["Data fechamento"] .min().strftime("%Y-%m-%d") if "Data fechamento" in df.columns and not df["Data fechamento"] .empty else "N/A",
-            "periodo_fim": df["Data fechamento"] .max().strftime("%Y-%m-%d") if "Data fechamento" in df.columns and not df["Data fechamento"] .empty else "N/A"
+    def get_dataset_version(self):
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT value FROM dataset_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def cached(self, namespace, filters, compute, version=None):
+        # Resultado compartilhado entre sessões para (namespace, versão da base, filtros normalizados)
+        if version is None:
+            version = self.get_dataset_version()
+        # Um span por consulta ao cache: nos acertos ele mostra só o custo da busca
+        computed = []
+
+        def compute_once():
+            computed.append(True)
+            return compute()
+
+        with span(namespace) as current:
+            value = self.cache.get_or_compute(namespace, version, normalize_filters(filters), compute_once)
+            current.set(cache="miss" if computed else "hit")
+            current.rows_out = row_count(value)
+        return value
+
+    @staticmethod
+    @traced()
+    def _refresh_rollup(cursor, full=False):
+        # Recalcula os agregados: tudo (full) ou apenas os dias listados em temp.rollup_days
+        annotate(full=full)
+        cursor.connection.create_function("sketch_bucket", 1, bucket_of, deterministic=True)
+        rollup_dimensions = ", ".join(f"t.`{col}`" for col in ROLLUP_DIMENSIONS)
+        rollup_measures = ", ".join(expr for _, expr in ROLLUP_MEASURES.values())
+        sketch_dimensions = ", ".join(f"t.`{col}`" for col in SKETCH_DIMENSIONS)
+        targets = {
+            "itsm_rollup": (
+                f"SELECT substr(t.`Data fechamento`, 1, 10), {rollup_dimensions}, {rollup_measures}",
+                "",
+                f"GROUP BY 1, {rollup_dimensions}"
+            ),
+            "itsm_resolution_sketch": (
+                f"SELECT substr(t.`Data fechamento`, 1, 10), {sketch_dimensions}, "
+                "sketch_bucket(t.`Tempo de Resolução (horas)`), COUNT(*)",
+                "t.`Tempo de Resolução (horas)` IS NOT NULL",
+                f"GROUP BY 1, {sketch_dimensions}, {2 + len(SKETCH_DIMENSIONS)}"
+            )
         }
-        print("DEBUG: Estatísticas de resumo obtidas")
-        return stats
 
+        for table, (select, condition, group_by) in targets.items():
+            if full:
+                cursor.execute(f"DELETE FROM {table}")
+                where = f"WHERE {condition}" if condition else ""
+                cursor.execute(f"INSERT INTO {table} {select} FROM itsm_data t {where} {group_by}")
+                continue
+
+            has_null_day = "EXISTS (SELECT 1 FROM rollup_days WHERE dia IS NULL)"
+            extra = f"AND {condition}" if condition else ""
+            cursor.execute(
+                f"DELETE FROM {table} WHERE `Data fechamento` IN (SELECT dia FROM rollup_days) "
+                f"OR (`Data fechamento` IS NULL AND {has_null_day})"
+            )
+            # Junção por intervalo usa o índice de "Data fechamento" para cada dia afetado
+            cursor.execute(
+                f"INSERT INTO {table} {select} FROM rollup_days a JOIN itsm_data t "
+                "ON t.`Data fechamento` >= a.dia AND t.`Data fechamento` < date(a.dia, '+1 day') "
+                f"{extra} {group_by}"
+            )
+            cursor.execute(
+                f"INSERT INTO {table} {select} FROM itsm_data t "
+                f"WHERE t.`Data fechamento` IS NULL AND {has_null_day} {extra} {group_by}"
+            )
+        if not full:
+            cursor.execute("DROP TABLE temp.rollup_days")
+
+    @staticmethod
+    def _unindex_search(cursor, source, params=()):
+        # Remove do índice de busca as linhas de `source` (FROM ... com alias d), antes de elas mudarem:
+        # no FTS5 com conteúdo externo a remoção precisa dos valores que foram indexados
+        search_list = ", ".join(f"`{col}`" for col in SEARCH_COLUMNS)
+        cursor.execute(
+            f"INSERT INTO itsm_search (itsm_search, rowid, {search_list}) SELECT 'delete', d.`{KEY_COLUMN}`, "
+            + ", ".join(f"d.`{col}`" for col in SEARCH_COLUMNS) + f" {source}",
+            params
+        )
+
+    @staticmethod
+    @traced()
+    def _refresh_partitions(cursor, months=None):
+        # Recalcula os metadados das partições: todas (months=None) ou só as dos meses informados
+        annotate(full=months is None)
+        where = f"`{PARTITION_COLUMN}` IS NOT NULL"
+        params = []
+        if months is None:
+            cursor.execute("DELETE FROM itsm_partitions")
+        else:
+            if not months:
+                return
+            marks = ", ".join("?" for _ in months)
+            cursor.execute(f"DELETE FROM itsm_partitions WHERE `month` IN ({marks})", months)
+            where = f"`{PARTITION_COLUMN}` IN ({marks})"
+            params = list(months)
+        cursor.execute(
+            "INSERT INTO itsm_partitions (`month`, `row_count`, `closed_rows`, `min_fechamento`, `max_fechamento`, "
+            "`min_criacao`, `max_criacao`, `version`) "
+            f"SELECT `{PARTITION_COLUMN}`, COUNT(*), COUNT(`Data fechamento`), MIN(`Data fechamento`), "
+            "MAX(`Data fechamento`), MIN(`Data criação`), MAX(`Data criação`), "
+            "(SELECT value FROM dataset_meta WHERE key = 'version') "
+            f"FROM itsm_data WHERE {where} GROUP BY `{PARTITION_COLUMN}`",
+            params
+        )
+
+    @staticmethod
+    def _date_bounds(start_date=None, end_date=None):
+        # Período como intervalo [início, fim) em texto comparável com as datas gravadas;
+        # data final inclusiva: até o fim do dia
+        start = pd.Timestamp(start_date).strftime("%Y-%m-%d") if start_date is not None else None
+        end = None
+        if end_date is not None:
+            end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        return start, end
+
+    @staticmethod
+    def _search_expression(text):
+        # Texto livre da busca -> consulta FTS5: cada palavra vira um prefixo entre aspas e todas precisam
+        # aparecer ("impress vpn" -> "impress"* "vpn"*); None quando não sobra nenhuma palavra
+        words = re.findall(r"\w+", text or "")
+        return " ".join(f'"{word}"*' for word in words) or None
+
+    @staticmethod
+    def _build_where(start_date=None, end_date=None, search=None, ordered_by_date=False, **filters):
+        # Compila os filtros em uma cláusula WHERE parametrizada; None significa "sem filtro".
+        # ordered_by_date: a consulta ordena por data de fechamento (ver fetch_page e iter_query)
+        clauses, params = [], []
+        expression = DataProcessor._search_expression(search)
+        if expression is not None:
+            # Chaves dos chamados encontrados pelo índice de busca, resolvidas pelo índice único da chave
+            clauses.append(f"`{KEY_COLUMN}` IN (SELECT rowid FROM itsm_search WHERE itsm_search MATCH ?)")
+            params.append(expression)
+        # Com busca, o "+" tira os índices das demais colunas do plano: o SQLite parte das chaves
+        # encontradas (em geral poucas) em vez de varrer o período/categoria inteiro e conferir cada
+        # chamado na lista da busca
+        column = "+`{}`" if expression is not None else "`{}`"
+        date_column = column.format("Data fechamento")
+        start, end = DataProcessor._date_bounds(start_date, end_date)
+        if ordered_by_date and expression is None:
+            # Período na mesma expressão da ordenação: idx_itsm_data_fechamento_pk atende o intervalo e
+            # a ordem, e cada página lê só as suas linhas em vez de ordenar o período inteiro; o "+" nos
+            # demais filtros evita que o SQLite troque esse índice pelo da categoria/analista e ordene tudo.
+            # Sem data inicial, "> ''" mantém de fora os chamados sem data, como na coluna original
+            column = "+`{}`"
+            date_column = DataProcessor._sort_expression("Data fechamento")
+            if start is None and end is not None:
+                clauses.append(f"{date_column} > ''")
+        if start is not None:
+            clauses.append(f"{date_column} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{date_column} < ?")
+            params.append(end)
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name not in FILTER_COLUMNS:
+                raise ValueError(f"Filtro desconhecido: {name}")
+            clauses.append(f"{column.format(FILTER_COLUMNS[name])} = ?")
+            params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    @traced()
+    def query(self, start_date=None, end_date=None, category=None, analyst=None, status=None, columns=None,
+              search=None):
+        columns = [col for col in (columns or RELEVANT_COLUMNS) if col in TABLE_SCHEMA]
+        if self.snapshots is not None:
+            return self._query_snapshot(start_date, end_date, columns, search, category=category, analyst=analyst,
+                                        status=status)
+        select = ", ".join(f"`{col}`" for col in columns)
+        where, params = self._build_where(start_date, end_date, search, category=category, analyst=analyst,
+                                          status=status)
+
+        # Leitura em blocos convertidos para a representação compacta: o pico de memória fica no bloco
+        with self.pool.reader() as conn:
+            chunks = [
+                self._compact(chunk)
+                for chunk in pd.read_sql_query(
+                    f"SELECT {select} FROM itsm_data{where}", conn, params=params, chunksize=QUERY_CHUNK_SIZE
+                )
+            ]
+        return pd.concat(chunks, ignore_index=True) if chunks else self._compact(pd.DataFrame(columns=columns))
+
+    @staticmethod
+    def _snapshot_schema():
+        # Tipos nativos no snapshot: datas como timestamp, dimensões com codificação de dicionário
+        import pyarrow as pa
+
+        fields = []
+        for col, col_type in TABLE_SCHEMA.items():
+            if col in DATE_COLUMNS:
+                arrow_type = pa.timestamp("ms")
+            elif col in CATEGORICAL_COLUMNS:
+                arrow_type = pa.dictionary(pa.int32(), pa.string())
+            elif col_type == "REAL":
+                arrow_type = pa.float32()
+            elif col == KEY_COLUMN:
+                arrow_type = pa.int64()
+            else:
+                arrow_type = pa.string()
+            fields.append((col, arrow_type))
+        return pa.schema(fields)
+
+    def _load_month(self, conn, month):
+        # Chamados de um mês de fechamento ("AAAA-MM"; None para os sem data) no formato do snapshot
+        select = ", ".join(f"`{col}`" for col in TABLE_SCHEMA)
+        if month is None:
+            where, params = "`Data fechamento` IS NULL", []
+        else:
+            start = pd.Timestamp(f"{month}-01")
+            where = "`Data fechamento` >= ? AND `Data fechamento` < ?"
+            params = [start.strftime("%Y-%m-%d"), (start + pd.DateOffset(months=1)).strftime("%Y-%m-%d")]
+        df = pd.read_sql_query(
+            f"SELECT {select} FROM itsm_data WHERE {where} ORDER BY `{KEY_COLUMN}`", conn, params=params
+        )
+        for col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+        return df
+
+    @traced()
+    def _refresh_snapshot(self, months=None):
+        # Gera o snapshot da versão atual; months: meses alterados desde a versão anterior
+        # (None reescreve todas as partições). Retorna a versão do snapshot.
+        with self.pool.reader() as conn:
+            # Transação de leitura: versão e linhas do mesmo estado da base
+            conn.execute("BEGIN")
+            version = conn.execute("SELECT value FROM dataset_meta WHERE key = 'version'").fetchone()[0]
+            if self.snapshots.has(version):
+                return version
+            existing = self.snapshots.versions()
+            base_version = None
+            if months is not None and existing and existing[-1] == version - 1:
+                base_version = existing[-1]
+            else:
+                months = [
+                    row[0] for row in conn.execute("SELECT DISTINCT substr(`Data fechamento`, 1, 7) FROM itsm_data")
+                ]
+            annotate(version=version, base_version=base_version, months=len(months))
+            self.snapshots.write(version, months, lambda month: self._load_month(conn, month), base_version)
+        return version
+
+    @traced()
+    def _query_snapshot(self, start_date, end_date, columns, search=None, **filters):
+        version = self.get_dataset_version()
+        if not self.snapshots.has(version):
+            version = self._refresh_snapshot()
+        equals = {FILTER_COLUMNS[name]: value for name, value in filters.items() if value is not None}
+        # A busca usa o índice FTS5 da base SQLite; o snapshot filtra pelas chaves encontradas
+        members = None
+        if self._search_expression(search) is not None:
+            members = {KEY_COLUMN: self.search_keys(search)}
+        annotate(version=version)
+        return self._compact(self.snapshots.read(version, columns, start_date, end_date, equals, members))
+
+    @traced()
+    def search_keys(self, search):
+        # Chaves dos chamados cujo título ou comentário contém todas as palavras da busca
+        expression = self._search_expression(search)
+        if expression is None:
+            return []
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT rowid FROM itsm_search WHERE itsm_search MATCH ?", (expression,)).fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _sort_expression(column):
+        # Nulos viram '' para que toda linha tenha posição definida na comparação por chave
+        return f"IFNULL(`{column}`, '')"
+
+    @staticmethod
+    def _native(value):
+        return value.item() if hasattr(value, "item") else value
+
+    @traced()
+    def fetch_page(self, columns, sort_by="Data fechamento", descending=False, anchor=None, direction="next",
+                   page_size=50, **filters):
+        # Paginação por chave (sort_by, PK): anchor é a chave da última (next) ou primeira (prev) linha
+        # da página atual; o custo independe da posição da página no resultado
+        annotate(direction=direction, sort_by=sort_by)
+        if sort_by not in TABLE_SCHEMA:
+            raise ValueError(f"Coluna de ordenação desconhecida: {sort_by}")
+        sort_expr = self._sort_expression(sort_by)
+        where, params = self._build_where(ordered_by_date=sort_by == "Data fechamento", **filters)
+        ascending_scan = (direction == "next") != descending
+        if anchor is not None:
+            comparison = ">" if ascending_scan else "<"
+            where += (" AND " if where else " WHERE ") + f"({sort_expr}, `{KEY_COLUMN}`) {comparison} (?, ?)"
+            params = params + list(anchor)
+        order = "ASC" if ascending_scan else "DESC"
+        select = ", ".join(f"`{col}`" for col in columns if col in TABLE_SCHEMA)
+
+        with self.pool.reader() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {select}, {sort_expr} AS _sort_key, `{KEY_COLUMN}` AS _pk FROM itsm_data{where} "
+                f"ORDER BY {sort_expr} {order}, `{KEY_COLUMN}` {order} LIMIT ?",
+                conn, params=params + [page_size]
+            )
+        if direction == "prev":
+            df = df.iloc[::-1].reset_index(drop=True)
+
+        if df.empty:
+            first_key = last_key = None
+        else:
+            # Escalares do numpy viram tipos nativos: o sqlite3 gravaria um np.int64 como BLOB na comparação
+            first_key = (self._native(df["_sort_key"].iloc[0]), int(df["_pk"].iloc[0]))
+            last_key = (self._native(df["_sort_key"].iloc[-1]), int(df["_pk"].iloc[-1]))
+        df = df.drop(columns=["_sort_key", "_pk"])
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+        return df, first_key, last_key
+
+    def iter_query(self, columns=None, chunksize=EXPORT_CHUNK_SIZE, **filters):
+        # Resultado filtrado em blocos, com os valores como estão na base (usado na exportação)
+        columns = [col for col in (columns or RELEVANT_COLUMNS) if col in TABLE_SCHEMA]
+        select = ", ".join(f"`{col}`" for col in columns)
+        where, params = self._build_where(ordered_by_date=True, **filters)
+        with self.pool.reader() as conn:
+            yield from pd.read_sql_query(
+                f"SELECT {select} FROM itsm_data{where} ORDER BY {self._sort_expression('Data fechamento')}, "
+                f"`{KEY_COLUMN}`",
+                conn, params=params, chunksize=chunksize
+            )
+
+    @traced()
+    def export(self, fmt="csv", columns=None, **filters):
+        # Gera o arquivo de exportação bloco a bloco num arquivo temporário (em memória até
+        # EXPORT_SPOOL_BYTES, em disco acima disso); retorna o arquivo posicionado no início
+        annotate(format=fmt)
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+        columns = [col for col in (columns or RELEVANT_COLUMNS) if col in TABLE_SCHEMA]
+        output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        chunks = self.iter_query(columns, **filters)
+
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            arrow_types = {"INTEGER NOT NULL": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+            schema = pa.schema([
+                (col, pa.timestamp("ms") if col in DATE_COLUMNS else arrow_types[TABLE_SCHEMA[col]])
+                for col in columns
+            ])
+            with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+                for chunk in chunks:
+                    for col in DATE_COLUMNS:
+                        if col in chunk.columns:
+                            chunk[col] = pd.to_datetime(chunk[col], errors="coerce", format="ISO8601")
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        else:
+            target = gzip.GzipFile(fileobj=output, mode="wb") if fmt == "csv.gz" else output
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(target, index=False, header=header, encoding="utf-8")
+                header = False
+            if header:
+                pd.DataFrame(columns=columns).to_csv(target, index=False, encoding="utf-8")
+            if target is not output:
+                target.close()
+
+        output.seek(0)
+        return output
+
+    @traced()
+    def count(self, start_date=None, end_date=None, category=None, analyst=None, status=None, search=None):
+        where, params = self._build_where(start_date, end_date, search, category=category, analyst=analyst,
+                                          status=status)
+        expression = self._search_expression(search)
+        no_columns = category is None and analyst is None and status is None
+        only_dates = no_columns and expression is None
+        with self.pool.reader() as conn:
+            if no_columns and expression is not None and start_date is None and end_date is None:
+                # Só a busca: cada entrada do índice é um chamado da tabela, então a contagem sai dele
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM itsm_search WHERE itsm_search MATCH ?", (expression,)
+                ).fetchone()[0]
+            elif only_dates and start_date is None and end_date is None:
+                # Sem filtros: soma das partições mais os chamados sem mês de fechamento
+                total = conn.execute("SELECT COALESCE(SUM(`row_count`), 0) FROM itsm_partitions").fetchone()[0]
+                total += conn.execute(
+                    f"SELECT COUNT(*) FROM itsm_data WHERE `{PARTITION_COLUMN}` IS NULL"
+                ).fetchone()[0]
+            elif only_dates:
+                # Só período: as partições inteiras no recorte são somadas pelos metadados e
+                # só as das bordas são contadas na tabela
+                covered, edges = self._partitions_in_range(conn, start_date, end_date)
+                total = sum(closed_rows for _, closed_rows in covered)
+                if edges:
+                    marks = ", ".join("?" for _ in edges)
+                    total += conn.execute(
+                        f"SELECT COUNT(*) FROM itsm_data{where} AND `{PARTITION_COLUMN}` IN ({marks})", params + edges
+                    ).fetchone()[0]
+                annotate(partitions_covered=len(covered), partitions_scanned=len(edges))
+            else:
+                total = conn.execute(f"SELECT COUNT(*) FROM itsm_data{where}", params).fetchone()[0]
+        return total
+
+    @staticmethod
+    def _partitions_in_range(conn, start_date=None, end_date=None):
+        # Partições que cruzam o período (pelos limites de "Data fechamento" nos metadados):
+        # (mês, chamados com fechamento) das que cabem inteiras nele e os meses das que só o tocam em parte
+        start, end = DataProcessor._date_bounds(start_date, end_date)
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("`max_fechamento` >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("`min_fechamento` < ?")
+            params.append(end)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        covered, edges = [], []
+        for month, closed_rows, min_closed, max_closed in conn.execute(
+            f"SELECT `month`, `closed_rows`, `min_fechamento`, `max_fechamento` FROM itsm_partitions{where}", params
+        ):
+            if (start is None or min_closed >= start) and (end is None or max_closed < end):
+                covered.append((month, closed_rows))
+            else:
+                edges.append(month)
+        return covered, edges
+
+    @traced()
+    def partitions(self):
+        # Metadados das partições por mês de fechamento (ver _refresh_partitions)
+        with self.pool.reader() as conn:
+            return pd.read_sql_query("SELECT * FROM itsm_partitions ORDER BY `month`", conn)
+
+    @traced()
+    def query_resolution_sketch(self, start_date=None, end_date=None, category=None, analyst=None, status=None):
+        # Combina os sketches do recorte somando as contagens por bucket (sem ler os chamados)
+        where, params = self._build_where(start_date, end_date, category=category, analyst=analyst, status=status)
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                f"SELECT `Bucket`, SUM(`{ROLLUP_COUNT}`) FROM itsm_resolution_sketch{where} GROUP BY `Bucket`", params
+            ).fetchall()
+        return QuantileSketch.from_buckets([row[0] for row in rows], [row[1] for row in rows])
+
+    def get_category_dictionary(self, column):
+        # Dicionário estável de categorias da base inteira (igual para todas as consultas da mesma versão)
+        def load():
+            with self.pool.reader() as conn:
+                rows = conn.execute(
+                    f"SELECT DISTINCT `{column}` FROM itsm_data WHERE `{column}` IS NOT NULL ORDER BY `{column}`"
+                ).fetchall()
+            return [row[0] for row in rows]
+        return self.cached(f"dictionary:{column}", {}, load)
+
+    def _compact(self, df):
+        # Categóricos com dicionário da base, booleanos para flags Sim/Não, inteiros e float32
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+        for col in CATEGORICAL_COLUMNS:
+            if col not in df.columns:
+                continue
+            dictionary = self.get_category_dictionary(col)
+            if col in FLAG_COLUMNS and set(dictionary) <= set(FLAG_VALUES):
+                df[col] = df[col].map(FLAG_VALUES).astype("boolean")
+            else:
+                df[col] = pd.Categorical(df[col], categories=dictionary)
+        if KEY_COLUMN in df.columns:
+            df[KEY_COLUMN] = df[KEY_COLUMN].astype("int64")
+        if "Tempo de Resolução (horas)" in df.columns:
+            df["Tempo de Resolução (horas)"] = df["Tempo de Resolução (horas)"].astype("float32")
+        return df
 
+    @staticmethod
+    def memory_report(df):
+        # Uso de memória por coluna do DataFrame carregado na sessão
+        usage = df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({
+            "Coluna": usage.index,
+            "Tipo": [str(df[col].dtype) for col in usage.index],
+            "Memória (KB)": (usage.values / 1024).round(1)
+        })
+        return {"total_bytes": int(usage.sum()), "linhas": len(df), "colunas": report}
+
+    def load_from_database(self):
+        return self.query()
+
+    def can_use_rollup(self, **filters):
+        # O agregado responde quando todos os filtros ativos são dimensões dele
+        return all(value is None or name in ROLLUP_FILTERS for name, value in filters.items())
+
+    @traced()
+    def query_rollup(self, start_date=None, end_date=None, category=None, analyst=None, status=None):
+        # Linhas do agregado para os filtros ativos: uma por combinação de dimensões, não por chamado
+        where, params = self._build_where(start_date, end_date, category=category, analyst=analyst, status=status)
+        dimensions = ", ".join(f"`{col}`" for col in ["Data fechamento"] + ROLLUP_DIMENSIONS)
+        measures = ", ".join(f"SUM(`{col}`) AS `{col}`" for col in ROLLUP_MEASURES)
+
+        with self.pool.reader() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {dimensions}, {measures} FROM itsm_rollup{where} GROUP BY {dimensions}", conn, params=params
+            )
+        return self._compact(df)
+
+    @traced()
+    def get_date_range(self):
+        # Limites lidos dos metadados das partições (uma linha por mês)
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT MIN(`min_fechamento`), MAX(`max_fechamento`) FROM itsm_partitions").fetchone()
+        if row[0] is None:
+            return None
+        return pd.Timestamp(row[0]).date(), pd.Timestamp(row[1]).date()
+
+    @traced()
+    def get_distinct_values(self, column, start_date=None, end_date=None, **filters):
+        # Opções dos filtros da sidebar, restritas pelos filtros já aplicados
+        where, params = self._build_where(start_date, end_date, **filters)
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                f"SELECT DISTINCT `{column}` FROM itsm_data{where} ORDER BY `{column}`", params
+            ).fetchall()
+        return [row[0] for row in rows if row[0] is not None]
+
+    def summarize(self, filters, version=None):
+        # Recorte (tabela agregada quando os filtros permitem, senão os chamados) e sua agregação,
+        # nas mesmas entradas do cache compartilhado pelo dashboard e pela API (ver modules/api.py)
+        if version is None:
+            version = self.get_dataset_version()
+        if self.can_use_rollup(**filters):
+            # Só os filtros ativos: os demais (ex.: busca vazia) não existem no agregado
+            active = {name: value for name, value in filters.items() if value is not None}
+            summary = self.cached("rollup", filters, lambda: self.query_rollup(**active), version)
+            sketch = self.cached(
+                "resolution_sketch", filters, lambda: self.query_resolution_sketch(**active), version
+            )
+        else:
+            summary = self.cached("query", filters, lambda: self.query(**filters), version)
+            sketch = None
+        aggregation = self.cached("aggregation", filters, lambda: self.aggregate(summary, sketch), version)
+        return summary, aggregation
+
+    @traced()
+    def aggregate(self, df, sketch=None):
+        # KPIs, estatísticas e séries dos gráficos numa única passada (ver modules/aggregation.py)
+        return aggregate(df, sketch)
+
+    @traced()
+    def backlog(self, category=None, analyst=None, search=None):
+        # Backlog diário por varredura de eventos (ver modules/backlog.py). O período não filtra os
+        # chamados (o backlog de um dia inclui os criados antes dele): a série é recortada depois
+        df = self.query(category=category, analyst=analyst, search=search,
+                        columns=["Data criação", "Data fechamento"] + BACKLOG_DIMENSIONS)
+        return sweep_backlog(df, BACKLOG_DIMENSIONS, BACKLOG_AGING_DAYS)
+
+    def calculate_kpis(self, df):
+        return self.aggregate(df).kpis
+
+    def get_summary_stats(self, df):
+        return self.aggregate(df).stats
@@ -0,0 +1,97 @@
+import contextlib
+import sqlite3
+import threading
+
+from config.settings import (
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_READ_POOL_SIZE
+)
+from modules.instrumentation import span
+
+
+class ConnectionPool:
+    # Conexões persistentes e configuradas para a base SQLite, compartilhadas entre sessões
+    # (o DataProcessor que as possui fica em st.cache_resource).
+    # Leitura: cada thread pega uma conexão livre do pool e a devolve ao terminar.
+    # Escrita: um único escritor por processo, serializado por um lock; com WAL as leituras
+    # seguem enxergando a última versão confirmada enquanto uma gravação está em andamento.
+    def __init__(self, db_path, read_pool_size=SQLITE_READ_POOL_SIZE):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self._idle_readers = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+
+    def connect(self, read_only=False):
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        # Valor negativo: tamanho em KB, não em páginas
+        conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextlib.contextmanager
+    def reader(self):
+        with self._lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            conn = self.connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            # Transação de leitura aberta prenderia o snapshot do WAL (e o checkpoint)
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle_readers) < self.read_pool_size:
+                    self._idle_readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    @contextlib.contextmanager
+    def writer(self, conn=None):
+        # Confirma ao sair (ou desfaz em caso de erro); conn permite gravar com uma conexão
+        # dedicada (ex.: tabelas temporárias da ingestão) mantendo o escritor único
+        if not self._write_lock.acquire(blocking=False):
+            # Escritor ocupado (ex.: ingestão aplicando um arquivo): só a espera vira span,
+            # contabilizado nas métricas como contenção de escrita
+            with span("ConnectionPool.write_wait"):
+                self._write_lock.acquire()
+        try:
+            if conn is None:
+                if self._writer is None:
+                    self._writer = self.connect()
+                conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            self._write_lock.release()
+
+    @contextlib.contextmanager
+    def dedicated(self):
+        # Conexão própria para operações longas, fechada ao final
+        conn = self.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            readers, self._idle_readers = self._idle_readers, []
+        for conn in readers:
+            conn.close()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
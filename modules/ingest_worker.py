@@ -0,0 +1,91 @@
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from modules import instrumentation
+
+ACTIVE_STATUSES = ("queued", "parsing", "writing")
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionWorker:
+    # Executa as ingestões fora da thread do script do Streamlit.
+    # Uma única thread de escrita: os arquivos enfileirados são gravados um de cada vez,
+    # e cada um é aplicado numa única transação (as sessões continuam lendo a versão
+    # anterior da base até o commit).
+    def __init__(self, processor):
+        self.processor = processor
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self.processor.fail_interrupted_jobs()
+
+    def submit(self, file_name, data):
+        # Retorna (job_id, ingestão anterior); job_id é None quando o arquivo já foi ingerido
+        data = bytes(data)
+        file_hash = self.processor.fingerprint(data)
+        with self._lock:
+            ingestion = self.processor.get_ingestion(file_hash)
+            if ingestion is not None:
+                return None, ingestion
+            job_id = self.processor.get_active_job(file_hash)
+            if job_id is not None:
+                return job_id, None
+            job_id = self.processor.create_job(file_name, file_hash, len(data))
+        self.executor.submit(self._run, job_id, file_name, file_hash, data)
+        return job_id, None
+
+    def _run(self, job_id, file_name, file_hash, data):
+        processor = self.processor
+        started = time.perf_counter()
+        processor.update_job(job_id, status="parsing", started_at=self._now())
+        parse_end = []
+
+        def report_progress(rows_read, fraction):
+            processor.update_job(job_id, rows_read=rows_read, progress=fraction)
+
+        def tracked_chunks():
+            # Leitura e gravação na tabela temporária são intercaladas; quando o último
+            # bloco é entregue só resta a aplicação na tabela principal
+            yield from processor.iter_file_chunks(io.BytesIO(data), progress=report_progress, file_name=file_name)
+            parse_end.append(time.perf_counter())
+            processor.update_job(job_id, status="writing", progress=1.0)
+
+        # Cada job é uma execução instrumentada própria (ver "Desempenho" no dashboard)
+        instrumentation.start_run("ingest")
+        try:
+            with instrumentation.span("IngestionWorker.job", job_id=job_id, file_name=file_name):
+                # Export de um mês fechado ("Mês/Ano fechamento" no preâmbulo) substitui a partição do mês
+                partitions = processor.declared_partitions(io.BytesIO(data), file_name)
+                result = processor.save_to_database(tracked_chunks(), partitions=partitions)
+                processor.record_ingestion(file_hash, file_name, len(data), result["rows"])
+            finished = time.perf_counter()
+            parsed = parse_end[0] if parse_end else finished
+            processor.update_job(
+                job_id, status="done", finished_at=self._now(), rows_read=result["rows"],
+                inserted=result["inserted"], updated=result["updated"], unchanged=result["unchanged"],
+                removed=result["removed"], partitions=",".join(result["partitions"]) or None,
+                parse_seconds=parsed - started, write_seconds=finished - parsed
+            )
+        except Exception as e:
+            logger.exception("Erro no job de ingestão %s (%s)", job_id, file_name)
+            processor.update_job(
+                job_id, status="failed", finished_at=self._now(), error=str(e),
+                parse_seconds=time.perf_counter() - started
+            )
+        finally:
+            instrumentation.finish_run()
+
+    def jobs(self, limit=10):
+        return self.processor.get_jobs(limit)
+
+    def has_active_jobs(self):
+        return any(job["status"] in ACTIVE_STATUSES for job in self.jobs())
+
+    @staticmethod
+    def _now():
+        return pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,304 @@
+import contextlib
+import functools
+import inspect
+import itertools
+import os
+import threading
+import time
+
+from config.settings import METRICS_EXPORT_PATH
+
+# Instrumentação leve das etapas do dashboard (ingestão, consultas, KPIs e gráficos).
+# Cada span registra duração, linhas de entrada/saída e a variação da memória residente do processo.
+# Os spans de uma execução (rerun do script, job de ingestão) ficam agrupados num Run da thread
+# e são acumulados por nome em métricas exportáveis no formato texto do Prometheus.
+#
+# Uso:
+#   with span("etapa", rows_in=len(df)) as current:
+#       ...
+#       current.rows_out = len(resultado)
+#
+#   @traced()
+#   def query(...): ...
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_state = threading.local()
+_last_runs = {}
+_last_runs_lock = threading.Lock()
+
+
+def rss_bytes():
+    # Memória residente atual do processo (Linux); None onde /proc não existe.
+    # É do processo inteiro: com sessões concorrentes a variação inclui o trabalho das outras threads
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def row_count(value):
+    # Linhas de um resultado: DataFrames e arrays pelo shape, gráficos pelo total de pontos
+    if value is None:
+        return None
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(value, tuple) and value and getattr(value[0], "shape", None):
+        # Ex.: (página, primeira chave, última chave)
+        return int(value[0].shape[0])
+    if hasattr(value, "to_plotly_json"):
+        points = 0
+        for trace in value.data:
+            for attribute in ("x", "values", "y"):
+                data = getattr(trace, attribute, None)
+                if data is not None:
+                    points += len(data)
+                    break
+        return points
+    if isinstance(value, (list, set)):
+        return len(value)
+    return None
+
+
+class Span:
+    def __init__(self, name, parent=None, rows_in=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.attributes = attributes
+        self.error = None
+        self.seconds = None
+        self.memory_delta = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Run:
+    # Spans de uma execução na ordem em que começaram (pais antes dos filhos)
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.spans = []
+        self.seconds = None
+        self._started = time.perf_counter()
+
+    def elapsed(self):
+        return self.seconds if self.seconds is not None else time.perf_counter() - self._started
+
+    def records(self):
+        return [
+            {
+                # Recuo com espaço largo (espaços comuns somem na tabela do Streamlit)
+                "Etapa": ("\u2003" * (span.depth - 1) + "↳ " if span.depth else "") + span.name,
+                "Duração (ms)": round(span.seconds * 1000, 1) if span.seconds is not None else None,
+                "Linhas entrada": span.rows_in,
+                "Linhas saída": span.rows_out,
+                "Memória (MB)": round(span.memory_delta / 1024 ** 2, 2) if span.memory_delta is not None else None,
+                "Detalhes": ", ".join(
+                    [f"{key}={value}" for key, value in span.attributes.items()]
+                    + ([f"erro={span.error}"] if span.error else [])
+                )
+            }
+            for span in self.spans
+        ]
+
+
+class MetricsRegistry:
+    # Acumulado por nome de span desde o início do processo
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def observe(self, span):
+        with self._lock:
+            entry = self._spans.setdefault(span.name, {
+                "count": 0, "seconds": 0.0, "rows_in": 0, "rows_out": 0, "errors": 0,
+                "last_seconds": 0.0, "last_memory_delta": 0
+            })
+            entry["count"] += 1
+            entry["seconds"] += span.seconds
+            entry["rows_in"] += span.rows_in or 0
+            entry["rows_out"] += span.rows_out or 0
+            entry["errors"] += 1 if span.error else 0
+            entry["last_seconds"] = span.seconds
+            if span.memory_delta is not None:
+                entry["last_memory_delta"] = span.memory_delta
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._spans.items()}
+
+    @staticmethod
+    def _label(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def to_prometheus(self):
+        families = [
+            ("itsm_span_duration_seconds", "summary", "Duração das etapas instrumentadas", None),
+            ("itsm_span_last_duration_seconds", "gauge", "Duração da última execução da etapa", "last_seconds"),
+            ("itsm_span_rows_in_total", "counter", "Linhas recebidas pela etapa", "rows_in"),
+            ("itsm_span_rows_out_total", "counter", "Linhas produzidas pela etapa", "rows_out"),
+            ("itsm_span_errors_total", "counter", "Execuções da etapa que terminaram em erro", "errors"),
+            ("itsm_span_memory_delta_bytes", "gauge", "Variação da memória residente na última execução",
+             "last_memory_delta")
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for metric, metric_type, description, key in families:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name, entry in sorted(snapshot.items()):
+                label = f'{{span="{self._label(name)}"}}'
+                if key is None:
+                    lines.append(f"{metric}_sum{label} {entry['seconds']:.6f}")
+                    lines.append(f"{metric}_count{label} {entry['count']}")
+                else:
+                    lines.append(f"{metric}{label} {entry[key]}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # Escrita atômica: quem lê o arquivo (ex.: textfile collector do node_exporter) nunca vê metade dele
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(staging, path)
+
+
+metrics = MetricsRegistry()
+
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+    return _state.stack
+
+
+def start_run(name):
+    # Inicia a coleta dos spans desta thread (descarta uma execução anterior não finalizada, ex.: st.stop)
+    _state.run = Run(name)
+    _state.stack = []
+    return _state.run
+
+
+def current_run():
+    return getattr(_state, "run", None)
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def annotate(rows_in=None, rows_out=None, **attributes):
+    # Atributos do span em andamento (ex.: codificação detectada, modo de gravação);
+    # rows_in/rows_out substituem as contagens inferidas pelo decorador
+    current = current_span()
+    if current is None:
+        return
+    if rows_in is not None:
+        current.rows_in = rows_in
+    if rows_out is not None:
+        current.rows_out = rows_out
+    current.set(**attributes)
+
+
+def finish_run():
+    run = current_run()
+    if run is None:
+        return None
+    run.seconds = run.elapsed()
+    _state.run = None
+    with _last_runs_lock:
+        _last_runs[run.name] = run
+    if METRICS_EXPORT_PATH:
+        metrics.export(METRICS_EXPORT_PATH)
+    return run
+
+
+@contextlib.contextmanager
+def run_scope(name):
+    # Execução própria só quando não há uma em andamento na thread (ex.: rerun isolado de um
+    # fragmento do Streamlit); dentro de um rerun completo os spans ficam no run do script
+    run = current_run()
+    if run is not None:
+        yield run
+        return
+    run = start_run(name)
+    try:
+        yield run
+    finally:
+        finish_run()
+
+
+def last_run(name):
+    # Última execução concluída com esse nome, em qualquer thread (ex.: o último job de ingestão)
+    with _last_runs_lock:
+        return _last_runs.get(name)
+
+
+@contextlib.contextmanager
+def span(name, rows_in=None, **attributes):
+    stack = _stack()
+    current = Span(name, stack[-1] if stack else None, rows_in, **attributes)
+    run = current_run()
+    if run is not None:
+        run.spans.append(current)
+    stack.append(current)
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        rss_after = rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            current.memory_delta = rss_after - rss_before
+        # Spans abertos em geradores podem não estar no topo (o consumidor abre os seus entre um bloco e outro)
+        if current in stack:
+            stack.remove(current)
+        metrics.observe(current)
+
+
+def _input_rows(args, kwargs):
+    for value in itertools.chain(args, kwargs.values()):
+        if getattr(value, "shape", None):
+            return int(value.shape[0])
+    return None
+
+
+def traced(name=None):
+    # Decorador: um span por chamada, com o nome qualificado da função por padrão.
+    # Em geradores o span cobre toda a iteração e rows_out soma as linhas dos blocos entregues.
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with span(span_name) as current:
+                    rows = 0
+                    for item in fn(*args, **kwargs):
+                        rows += row_count(item) or 0
+                        yield item
+                    if current.rows_out is None:
+                        current.rows_out = rows
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, rows_in=_input_rows(args, kwargs)) as current:
+                result = fn(*args, **kwargs)
+                if current.rows_out is None:
+                    current.rows_out = row_count(result)
+                return result
+        return wrapper
+    return decorator
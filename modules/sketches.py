@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pandas as pd
+from config.settings import SKETCH_RELATIVE_ACCURACY
+
+# Valores abaixo deste limite (inclusive zero) caem num bucket próprio
+MIN_INDEXABLE_VALUE = 1e-3
+ZERO_BUCKET = -(2 ** 31)
+
+GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket_of(value):
+    # Índice do bucket logarítmico de um valor (usado também como função SQL na ingestão)
+    if value is None:
+        return None
+    if value <= MIN_INDEXABLE_VALUE:
+        return ZERO_BUCKET
+    return math.ceil(math.log(value) / LOG_GAMMA)
+
+
+def bucket_value(buckets):
+    # Valor representativo de cada bucket: erro relativo de no máximo SKETCH_RELATIVE_ACCURACY
+    buckets = np.asarray(buckets, dtype="int64")
+    values = 2 * np.power(GAMMA, buckets.astype("float64")) / (GAMMA + 1)
+    return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+
+class QuantileSketch:
+    # Sketch de quantis com erro relativo limitado (buckets logarítmicos, no estilo DDSketch).
+    # Sketches de recortes diferentes se combinam somando as contagens de cada bucket.
+    def __init__(self, counts=None):
+        self.counts = counts if counts is not None else pd.Series(dtype="int64")
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[np.isfinite(values) & (values >= 0)]
+        if values.size == 0:
+            return cls()
+        buckets = np.full(values.size, ZERO_BUCKET, dtype="int64")
+        indexable = values > MIN_INDEXABLE_VALUE
+        buckets[indexable] = np.ceil(np.log(values[indexable]) / LOG_GAMMA)
+        unique, counts = np.unique(buckets, return_counts=True)
+        return cls(pd.Series(counts, index=unique, dtype="int64"))
+
+    @classmethod
+    def from_buckets(cls, buckets, counts):
+        series = pd.Series(np.asarray(counts, dtype="int64"), index=np.asarray(buckets, dtype="int64"))
+        return cls(series.groupby(level=0).sum().sort_index())
+
+    def merge(self, other):
+        return QuantileSketch(self.counts.add(other.counts, fill_value=0).astype("int64").sort_index())
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float("nan")
+        cumulative = self.counts.cumsum().to_numpy()
+        rank = q * (self.count - 1)
+        position = int(np.searchsorted(cumulative, rank, side="right"))
+        return float(bucket_value([self.counts.index[position]])[0])
+
+    def quantiles(self, qs=(0.5, 0.9, 0.99)):
+        return {q: self.quantile(q) for q in qs}
+
+    def histogram(self, bins=20):
+        # Histograma calculado no servidor a partir dos buckets; retorna (bordas, contagens)
+        if self.count == 0:
+            return np.array([]), np.array([])
+        values = bucket_value(self.counts.index)
+        counts, edges = np.histogram(values, bins=bins, weights=self.counts.to_numpy())
+        return edges, counts
@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from modules.instrumentation import traced, annotate
+
+# Partição por mês de fechamento ("Mês/Ano fechamento" do export, como AAAA-MM no caminho)
+PARTITION_FIELD = "mes_fechamento"
+NO_DATE_PARTITION = "sem_data"
+
+
+class ParquetSnapshotStore:
+    # Snapshots colunares da tabela principal, um diretório por versão da base:
+    #   <raiz>/v<versão>/mes_fechamento=AAAA-MM/part-0.parquet
+    # Uma nova versão reaproveita (hardlink) as partições dos meses que não mudaram.
+    # Versões antigas continuam legíveis por quem já as abriu (arquivos mapeados em memória).
+    def __init__(self, root, schema, keep_versions=2):
+        self.root = root
+        self.schema = schema
+        self.keep_versions = keep_versions
+        self.filesystem = pafs.LocalFileSystem(use_mmap=True)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def partition_of(month):
+        # month: "AAAA-MM" ou None (chamados sem data de fechamento)
+        return f"{PARTITION_FIELD}={month or NO_DATE_PARTITION}"
+
+    def path_for(self, version):
+        return os.path.join(self.root, f"v{version}")
+
+    def versions(self):
+        versions = []
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:].isdigit():
+                versions.append(int(name[1:]))
+        return sorted(versions)
+
+    def has(self, version):
+        return os.path.isdir(self.path_for(version))
+
+    @traced()
+    def write(self, version, months, load_month, base_version=None):
+        # months: meses a (re)escrever; as demais partições vêm de base_version (None: escreve tudo)
+        with self._lock:
+            if self.has(version):
+                return
+            staging = os.path.join(self.root, f".tmp-v{version}-{os.getpid()}-{threading.get_ident()}")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            rewritten = {self.partition_of(month) for month in months}
+            if base_version is not None:
+                base = self.path_for(base_version)
+                for partition in os.listdir(base):
+                    if partition in rewritten:
+                        continue
+                    os.makedirs(os.path.join(staging, partition))
+                    for name in os.listdir(os.path.join(base, partition)):
+                        os.link(os.path.join(base, partition, name), os.path.join(staging, partition, name))
+
+            for month in months:
+                df = load_month(month)
+                if df.empty:
+                    continue
+                partition = os.path.join(staging, self.partition_of(month))
+                os.makedirs(partition, exist_ok=True)
+                table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+                pq.write_table(table, os.path.join(partition, "part-0.parquet"), compression="zstd")
+
+            # Publicação atômica: o diretório da versão só aparece completo
+            os.rename(staging, self.path_for(version))
+            for old in self.versions()[:-self.keep_versions]:
+                shutil.rmtree(self.path_for(old), ignore_errors=True)
+        annotate(version=version, partitions_rewritten=len(months))
+
+    @traced()
+    def read(self, version, columns, start_date=None, end_date=None, equals=None, members=None):
+        # Lê só as colunas pedidas e só as partições dos meses do período (poda pelo caminho);
+        # equals: coluna -> valor; members: coluna -> valores aceitos (ex.: chaves encontradas pela busca)
+        partition_schema = pa.schema([(PARTITION_FIELD, pa.string())])
+        dataset = ds.dataset(
+            self.path_for(version), format="parquet", filesystem=self.filesystem,
+            schema=self.schema.append(partition_schema.field(0)),
+            partitioning=ds.partitioning(partition_schema, flavor="hive")
+        )
+        expression = None
+        conditions = []
+        if start_date is not None:
+            start = pd.Timestamp(start_date).normalize()
+            conditions.append(ds.field(PARTITION_FIELD) >= start.strftime("%Y-%m"))
+            conditions.append(ds.field("Data fechamento") >= pa.scalar(start, type=pa.timestamp("ms")))
+        if end_date is not None:
+            end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+            conditions.append(ds.field(PARTITION_FIELD) <= pd.Timestamp(end_date).strftime("%Y-%m"))
+            conditions.append(ds.field("Data fechamento") < pa.scalar(end, type=pa.timestamp("ms")))
+        for column, value in (equals or {}).items():
+            conditions.append(ds.field(column) == value)
+        for column, values in (members or {}).items():
+            conditions.append(ds.field(column).isin(values))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        table = dataset.to_table(columns=columns, filter=expression)
+        return table.to_pandas(coerce_temporal_nanoseconds=True)
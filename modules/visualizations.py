@@ -2,13 +2,54 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 import pandas as pd
-from config.settings import COLORS, SLA_COLORS, PRIORITY_COLORS, SATISFACTION_COLORS
+import numpy as np
+from config.settings import (
+    COLORS, SLA_COLORS, PRIORITY_COLORS, SATISFACTION_COLORS,
+    CHART_MAX_POINTS, CHART_TOP_ANALYSTS, CHART_WEBGL_THRESHOLD, RESOLUTION_HISTOGRAM_BINS
+)
+from modules.aggregation import AggregationResult, aggregate
+from modules.instrumentation import traced
 
-print("DEBUG: visualizations.py carregado")
+# Agrupamentos de tempo do mais fino ao mais grosso: (frequência, dias aproximados, rótulo)
+TIME_BUCKETS = [("D", 1, "Dia"), ("W", 7, "Semana"), ("M", 31, "Mês")]
 
 class DashboardVisualizations:
+    @staticmethod
+    def _aggregated(data):
+        # Os gráficos consomem o resultado da agregação; um DataFrame é agregado na hora
+        return data if isinstance(data, AggregationResult) else aggregate(data)
+
+    @staticmethod
+    def _choose_bucket(first_day, last_day, n_series=1):
+        # Menor agrupamento de tempo que mantém o gráfico dentro do orçamento de pontos
+        n_days = (pd.Timestamp(last_day) - pd.Timestamp(first_day)).days + 1
+        for freq, days, label in TIME_BUCKETS:
+            if -(-n_days // days) * n_series <= CHART_MAX_POINTS:
+                return freq, label
+        return TIME_BUCKETS[-1][0], TIME_BUCKETS[-1][2]
+
+    @staticmethod
+    def _bucket_dates(dates, freq):
+        dates = pd.to_datetime(pd.Series(dates))
+        if freq == "D":
+            return dates
+        return dates.dt.to_period(freq).dt.start_time
+
+    @staticmethod
+    def _with_payload_size(fig):
+        # Registra no próprio gráfico o tamanho do JSON enviado ao navegador
+        fig.update_layout(meta={"payload_bytes": len(fig.to_json())})
+        return fig
+
+    @staticmethod
+    def payload_size(fig):
+        meta = fig.layout.meta if fig is not None else None
+        if isinstance(meta, dict) and "payload_bytes" in meta:
+            return meta["payload_bytes"]
+        return len(fig.to_json()) if fig is not None else 0
+
+    @traced()
     def create_kpi_cards(self, kpis):
-        print("DEBUG: Criando cartões KPI")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             # CORREÇÃO: Uso de aspas simples para evitar o caractere de escape \
@@ -22,103 +63,174 @@ class DashboardVisualizations:
         with col4:
             # CORREÇÃO: Uso de aspas simples
             st.metric(label="Tempo Médio (h)", value=f"{kpis.get('tempo_medio_resolucao', 0):.1f}")
+        if "tempo_p50_resolucao" in kpis:
+            # Percentis do tempo de resolução (a média é distorcida pelos chamados de cauda longa)
+            col5, col6, col7, _ = st.columns(4)
+            with col5:
+                st.metric(label="Tempo P50 (h)", value=f"{kpis['tempo_p50_resolucao']:.1f}")
+            with col6:
+                st.metric(label="Tempo P90 (h)", value=f"{kpis['tempo_p90_resolucao']:.1f}")
+            with col7:
+                st.metric(label="Tempo P99 (h)", value=f"{kpis['tempo_p99_resolucao']:.1f}")
 
-    def create_category_chart(self, df):
-        print("DEBUG: Criando gráfico de categoria")
-        if df.empty or "Categoria" not in df.columns:
+    @traced()
+    def create_category_chart(self, data):
+        result = self._aggregated(data)
+        if result.empty or result.series["categoria"].empty:
             return None
-        category_counts = df["Categoria"].value_counts().reset_index()
+        category_counts = result.series["categoria"].reset_index()
         category_counts.columns = ["Categoria", "Quantidade"]
         fig = px.pie(category_counts, values="Quantidade", names="Categoria", title="Distribuição por Categoria",
                      color="Categoria", color_discrete_map=COLORS)
         fig.update_traces(textposition="inside", textinfo="percent+label")
         return fig
 
-    def create_timeline_chart(self, df):
-        print("DEBUG: Criando gráfico de timeline")
-        if df.empty or "Data fechamento" not in df.columns:
-            return None
-        df_filtered = df.dropna(subset=["Data fechamento"])
-        if df_filtered.empty:
+    @traced()
+    def create_timeline_chart(self, data):
+        result = self._aggregated(data)
+        if result.series["diario"].empty:
             return None
         
-        # Agrupar por dia e contar chamados
-        daily_counts = df_filtered["Data fechamento"].dt.date.value_counts().sort_index().reset_index()
-        daily_counts.columns = ["Data", "Quantidade"]
+        # Contagem por dia já calculada na agregação; reagrupada por semana/mês em períodos longos
+        daily = result.series["diario"]
+        freq, label = self._choose_bucket(daily.index[0], daily.index[-1])
+        counts = daily.groupby(self._bucket_dates(daily.index, freq).values).sum()
+        daily_counts = pd.DataFrame({"Data": counts.index, "Quantidade": counts.values})
         
-        fig = px.line(daily_counts, x="Data", y="Quantidade", title="Chamados por Dia")
+        fig = px.line(daily_counts, x="Data", y="Quantidade", title=f"Chamados por {label}",
+                      render_mode="webgl" if len(daily_counts) > CHART_WEBGL_THRESHOLD else "auto")
         fig.update_xaxes(rangeslider_visible=True)
-        return fig
+        return self._with_payload_size(fig)
 
-    def create_analyst_performance_chart(self, df):
-        print("DEBUG: Criando gráfico de performance do analista")
-        if df.empty or "Analista Responsável" not in df.columns:
+    @traced()
+    def create_analyst_performance_chart(self, data):
+        result = self._aggregated(data)
+        if result.empty or result.series["analista"].empty:
             return None
-        analyst_counts = df["Analista Responsável"].value_counts().reset_index()
+        analyst_counts = result.series["analista"].reset_index()
         analyst_counts.columns = ["Analista", "Chamados Encerrados"]
         fig = px.bar(analyst_counts.head(10), x="Analista", y="Chamados Encerrados", 
                      title="Top 10 Analistas por Chamados Encerrados",
                      color="Chamados Encerrados", color_continuous_scale=px.colors.sequential.Plasma)
         return fig
 
-    def create_sla_chart(self, df):
-        print("DEBUG: Criando gráfico de SLA")
-        if df.empty or "SLA Atendido" not in df.columns:
+    @traced()
+    def create_sla_chart(self, data):
+        result = self._aggregated(data)
+        if result.empty or result.series["sla"].empty:
             return None
-        sla_counts = df["SLA Atendido"].value_counts(normalize=True).reset_index()
+        sla_counts = result.series["sla"].reset_index()
         sla_counts.columns = ["SLA Atendido", "Percentual"]
-        sla_counts["Percentual"] = sla_counts["Percentual"] * 100
+        sla_counts["Percentual"] = sla_counts["Percentual"] / sla_counts["Percentual"].sum() * 100
         fig = px.pie(sla_counts, values="Percentual", names="SLA Atendido", title="Cumprimento de SLA",
                      color="SLA Atendido", color_discrete_map=SLA_COLORS)
         fig.update_traces(textposition="inside", textinfo="percent+label")
         return fig
 
-    def create_priority_chart(self, df):
-        print("DEBUG: Criando gráfico de prioridade")
-        if df.empty or "Prioridade" not in df.columns:
+    @traced()
+    def create_priority_chart(self, data):
+        result = self._aggregated(data)
+        if result.empty or result.series["prioridade"].empty:
             return None
         priority_order = ["P1", "P2", "P3", "P4"]
-        priority_counts = df["Prioridade"].value_counts().reindex(priority_order).fillna(0).reset_index()
+        priority_counts = result.series["prioridade"].reindex(priority_order).fillna(0).reset_index()
         priority_counts.columns = ["Prioridade", "Quantidade"]
         fig = px.bar(priority_counts, x="Prioridade", y="Quantidade", title="Chamados por Prioridade",
                      color="Prioridade", color_discrete_map=PRIORITY_COLORS)
         return fig
 
-    def create_satisfaction_chart(self, df):
-        print("DEBUG: Criando gráfico de satisfação")
-        if df.empty or "Grau de Satisfação" not in df.columns:
+    @traced()
+    def create_satisfaction_chart(self, data):
+        result = self._aggregated(data)
+        if result.empty or result.series["satisfacao"].empty:
             return None
         satisfaction_order = ["Ótimo", "Bom", "Regular", "Ruim", "Péssimo"]
-        satisfaction_counts = df["Grau de Satisfação"].value_counts().reindex(satisfaction_order).fillna(0).reset_index()
+        satisfaction_counts = result.series["satisfacao"].reindex(satisfaction_order).fillna(0).reset_index()
         satisfaction_counts.columns = ["Grau de Satisfação", "Quantidade"]
         fig = px.bar(satisfaction_counts, x="Grau de Satisfação", y="Quantidade", title="Grau de Satisfação",
                      color="Grau de Satisfação", color_discrete_map=SATISFACTION_COLORS)
         return fig
 
-    def create_analyst_daily_productivity(self, df):
-        print("DEBUG: Criando gráfico de produtividade diária do analista")
-        if df.empty or "Data fechamento" not in df.columns or "Analista Responsável" not in df.columns:
+    @traced()
+    def create_analyst_daily_productivity(self, data):
+        result = self._aggregated(data)
+        daily_productivity = result.series["analista_diario"]
+        if daily_productivity.empty:
             return None
+
+        # Top-N analistas; os demais somados em "Outros"
+        totals = daily_productivity.groupby("Analista Responsável")["Chamados Encerrados"].sum()
+        top_analysts = totals.nlargest(CHART_TOP_ANALYSTS).index
+        analysts = daily_productivity["Analista Responsável"].where(
+            daily_productivity["Analista Responsável"].isin(top_analysts), "Outros"
+        )
+        n_series = analysts.nunique()
+
+        freq, label = self._choose_bucket(daily_productivity["Data"].min(), daily_productivity["Data"].max(), n_series)
+        buckets = self._bucket_dates(daily_productivity["Data"], freq)
+        productivity = (
+            daily_productivity["Chamados Encerrados"]
+            .groupby([buckets.values, analysts.values]).sum()
+            .rename_axis(["Data", "Analista Responsável"])
+            .reset_index()
+        )
         
-        df_filtered = df.dropna(subset=["Data fechamento", "Analista Responsável"])
-        if df_filtered.empty:
+        fig = px.line(productivity, x="Data", y="Chamados Encerrados", color="Analista Responsável",
+                      title=f"Produtividade por {label} por Analista",
+                      render_mode="webgl" if len(productivity) > CHART_WEBGL_THRESHOLD else "auto")
+        fig.update_xaxes(rangeslider_visible=True)
+        return self._with_payload_size(fig)
+
+    @traced()
+    def create_backlog_chart(self, backlog, breakdown=None):
+        # backlog: BacklogResult (ver modules/backlog.py); breakdown: dimensão da quebra ou None para o total
+        if backlog.empty:
             return None
+        if breakdown is None:
+            series = backlog.total.to_frame("Chamados em Aberto")
+        else:
+            series = backlog.breakdowns.get(breakdown)
+            if series is None or series.empty:
+                return None
+            # Top-N valores pelo backlog médio; os demais somados em "Outros"
+            top = series.mean().nlargest(CHART_TOP_ANALYSTS).index
+            if len(top) < series.shape[1]:
+                series = series[top].assign(Outros=series.drop(columns=top).sum(axis=1))
 
-        daily_productivity = df_filtered.groupby([df_filtered["Data fechamento"].dt.date, "Analista Responsável"]).size().reset_index(name="Chamados Encerrados")
-        daily_productivity.columns = ["Data", "Analista Responsável", "Chamados Encerrados"]
-        
-        fig = px.line(daily_productivity, x="Data", y="Chamados Encerrados", color="Analista Responsável",
-                      title="Produtividade Diária por Analista")
+        # Backlog é um estoque: por semana/mês vale o valor do último dia do período, não a soma
+        freq, label = self._choose_bucket(series.index[0], series.index[-1], series.shape[1])
+        if freq != "D":
+            series = series.groupby(series.index.to_period(freq)).last()
+            series.index = series.index.start_time
+        series = series.rename_axis("Data")
+
+        if breakdown is None:
+            backlog_series = series.reset_index()
+            fig = px.line(backlog_series, x="Data", y="Chamados em Aberto",
+                          title=f"Backlog de Chamados em Aberto por {label}",
+                          render_mode="webgl" if len(backlog_series) > CHART_WEBGL_THRESHOLD else "auto")
+        else:
+            backlog_series = series.reset_index().melt(id_vars="Data", var_name=breakdown, value_name="Chamados em Aberto")
+            fig = px.area(backlog_series, x="Data", y="Chamados em Aberto", color=breakdown,
+                          title=f"Backlog de Chamados em Aberto por {label} ({breakdown})")
         fig.update_xaxes(rangeslider_visible=True)
-        return fig
+        return self._with_payload_size(fig)
 
-    def create_resolution_time_chart(self, df):
-        print("DEBUG: Criando gráfico de tempo de resolução")
-        if df.empty or "Tempo de Resolução (horas)" not in df.columns:
+    @traced()
+    def create_resolution_time_chart(self, data):
+        result = self._aggregated(data)
+        # Binning feito no servidor: só as bordas e contagens vão para o navegador
+        edges, counts = result.sketch.histogram(RESOLUTION_HISTOGRAM_BINS)
+        if len(counts) == 0:
             return None
         
-        fig = px.histogram(df, x="Tempo de Resolução (horas)", nbins=20, title="Distribuição do Tempo de Resolução (horas)")
-        fig.update_layout(xaxis_title="Tempo de Resolução (horas)", yaxis_title="Número de Chamados")
+        fig = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate="%{customdata[0]:.1f}–%{customdata[1]:.1f} h<br>%{y:,.0f} chamados<extra></extra>"
+        ))
+        fig.update_layout(title="Distribuição do Tempo de Resolução (horas)", bargap=0,
+                          xaxis_title="Tempo de Resolução (horas)", yaxis_title="Número de Chamados")
         return fig
-
-
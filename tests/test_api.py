@@ -0,0 +1,34 @@
+import datetime
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from modules.api import ApiError, parse_filters
+
+# python -m pytest tests (ou python -m unittest discover tests)
+
+
+class ParseFiltersTest(unittest.TestCase):
+    def test_dates(self):
+        filters = parse_filters("start_date=2025-06-01&end_date=2025-06-30&analyst=mariap")
+        self.assertEqual(filters["start_date"], datetime.date(2025, 6, 1))
+        self.assertEqual(filters["end_date"], datetime.date(2025, 6, 30))
+        self.assertEqual(filters["analyst"], "mariap")
+        self.assertIsNone(filters["category"])
+
+    def test_invalid_date(self):
+        # Texto que o pandas lê como NaT (sem erro) também é data inválida, não erro 500 mais adiante
+        for value in ("abc", "2025-13-01", "NaT", "nat", "NaN"):
+            with self.subTest(value=value), self.assertRaises(ApiError) as raised:
+                parse_filters(f"start_date={value}")
+            self.assertEqual(raised.exception.status, 400)
+
+    def test_unknown_filter(self):
+        with self.assertRaises(ApiError) as raised:
+            parse_filters("priority=Alta")
+        self.assertEqual(raised.exception.status, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()